@@ -1,105 +1,163 @@
 
 import streamlit as st
-import pandas as pd
-from io import BytesIO
-from pathlib import Path
 import datetime
+import uuid
+import pandas as pd
+
+from storage import (load_all, load_versioned, insert_row, bulk_insert, update_row, delete_student,
+                     cache_stats, sync_status, stored, ConflictError)
+from indexes import (name_by_sid, name_index, with_names, credential_index, student_no_exists,
+                     student_rows, student_stats, overlapping_outings, memory_usage)
+from report import make_report, parquet_available, REPORT_FORMATS
+from widgets import paged_table, student_picker
+from bulk import read_upload, template, validate
+from approvals import PENDING, STATUSES, pending_queue, plan_rules, transition
+from rollcall import away_on, residents_on, room_occupancy
+from archive import (academic_year, archived_years, close_year, student_totals, with_archive, year_range,
+                     year_tables)
+from timing import rerun, span, span_stats, slowest
 
 # ================== 설정 ==================
 st.set_page_config(page_title="달구벌고등학교 기숙사 관리프로그램", layout="wide")
 APP_TITLE_HTML = "<h3 style='margin:4px 0'>달구벌고등학교 기숙사 관리프로그램</h3>"
-DATA_FILE = Path("data.xlsx")
 ADMIN_ID = "admin"
 ADMIN_PW = "admin123"
 
-# 내부 저장 컬럼 (영문 컬럼으로 저장, 화면은 한글 표시)
-STU_COLS = ["ID","Name","StudentNo","Gender","Room","Phone","ParentPhone","Address","MiddleSchool","InDate","OutDate","Password","Note"]
-OUT_COLS = ["ID","StudentID","Type","Reason","StartDate","EndDate","Status"]
-SCO_COLS = ["ID","StudentID","Category","Points","Reason","Date"]
-PAY_COLS = ["ID","StudentID","Period","Amount","Status","PayDate","Method","Note"]
-
 # ================== 공통 유틸 ==================
-def _ensure_file():
-    if not DATA_FILE.exists():
-        with pd.ExcelWriter(DATA_FILE, engine="openpyxl") as w:
-            pd.DataFrame(columns=STU_COLS).to_excel(w, "Students", index=False)
-            pd.DataFrame(columns=OUT_COLS).to_excel(w, "Outings", index=False)
-            pd.DataFrame(columns=SCO_COLS).to_excel(w, "Scores", index=False)
-            pd.DataFrame(columns=PAY_COLS).to_excel(w, "Payments", index=False)
-
-def load_all():
-    _ensure_file()
-    xls = pd.ExcelFile(DATA_FILE, engine="openpyxl")
-    students = pd.read_excel(xls, "Students").fillna("")
-    outings  = pd.read_excel(xls, "Outings").fillna("")
-    scores   = pd.read_excel(xls, "Scores").fillna("")
-    payments = pd.read_excel(xls, "Payments").fillna("")
-    return students, outings, scores, payments
-
-def save_all(students, outings, scores, payments):
-    with pd.ExcelWriter(DATA_FILE, engine="openpyxl") as w:  # 통합 저장 (append 모드 사용 안 함)
-        students.to_excel(w, "Students", index=False)
-        outings.to_excel(w,  "Outings", index=False)
-        scores.to_excel(w,   "Scores", index=False)
-        payments.to_excel(w, "Payments", index=False)
-
-def next_id(df):
-    if df.empty:
-        return 1
-    return int(pd.to_numeric(df["ID"], errors="coerce").max()) + 1
-
-def name_by_sid(students, sid):
-    row = students[students["ID"]==sid]
-    return row.iloc[0]["Name"] if len(row)==1 else ""
+def form_base(key, version):
+    # 폼이 화면에 그려졌던 시점의 데이터 버전 (제출 rerun 에서는 직전 렌더링의 버전을 돌려줌)
+    k = f"_base_{key}"
+    base = st.session_state.get(k, version)
+    st.session_state[k] = version
+    return base
+
+def write_or_error(fn, *args, **kwargs):
+    # 쓰기 큐 커밋. 다른 세션과 충돌해 거부되거나 저장에 실패하면 오류를 표시하고 False
+    try:
+        fn(*args, **kwargs)
+        return True
+    except ConflictError as e:
+        st.error(str(e))
+    except TimeoutError:
+        st.error("저장 실패: 저장이 지연되고 있습니다. 잠시 후 목록을 확인하고 다시 시도하세요.")
+    except Exception as e:   # 백엔드 오류 (DB 잠김, 파일 쓰기 실패 등) — 쓰기 스레드가 로그를 남김
+        st.error(f"저장 실패: {e}")
+    return False
 
 def get_student_by_studentno(students, student_no):
-    # 학번을 문자열로 비교
-    return students[students["StudentNo"].astype(str) == str(student_no)]
-
-# ================== 보고서 ==================
-def make_report(students, outings, scores, payments):
-    # 학생(한글 컬럼 추출)
-    stu_export = students.rename(columns={
+    # 학번 인덱스로 찾고, 중복 학번일 때만 문자열 비교로 전부 찾음
+    hit = credential_index(students).get(str(student_no), ())
+    if hit is None:
+        return students[students["StudentNo"] == str(student_no)]
+    return students[students["ID"] == hit[0]] if hit else students.iloc[0:0]
+
+def date_or_today(v):
+    # 저장된 날짜(Timestamp, 빈 값은 NaT) → 날짜 입력 기본값
+    return v.date() if pd.notna(v) else datetime.date.today()
+
+# ================== 목록 화면 변환 (현재 페이지 행만) ==================
+def students_view(df):
+    view = stored("Students", df).rename(columns={
         "Name":"이름","StudentNo":"학번","Gender":"성별","Room":"호실",
         "Phone":"학생연락처","ParentPhone":"보호자연락처","Address":"주소",
         "MiddleSchool":"출신중학교","InDate":"입사일","OutDate":"퇴사일","Note":"특이사항"
-    })[["이름","학번","성별","호실","학생연락처","보호자연락처","주소","출신중학교","입사일","퇴사일","특이사항"]]
-
-    # 외출_외박
-    out = outings.copy()
-    out["이름"] = out["StudentID"].apply(lambda x: name_by_sid(students, x))
-    out_export = out.rename(columns={"Type":"구분","Reason":"사유","StartDate":"시작일","EndDate":"종료일","Status":"상태"})
-    out_export = out_export[["이름","구분","사유","시작일","종료일","상태"]]
-
-    # 상벌점
-    sco = scores.copy()
-    sco["이름"] = sco["StudentID"].apply(lambda x: name_by_sid(students, x))
-    sco_export = sco.rename(columns={"Category":"구분","Points":"점수","Reason":"사유_비고","Date":"일자"})
-    sco_export = sco_export[["이름","구분","점수","사유_비고","일자"]]
-
-    # 납부
-    pay = payments.copy()
-    pay["이름"] = pay["StudentID"].apply(lambda x: name_by_sid(students, x))
-    pay_export = pay.rename(columns={"Period":"납부_회차_기간","Amount":"금액","Status":"상태","PayDate":"납부일","Method":"방법","Note":"비고"})
-    pay_export = pay_export[["이름","납부_회차_기간","금액","상태","납부일","방법","비고"]]
-
-    # 상벌점 요약
-    if len(sco_export)==0:
-        summary = pd.DataFrame(columns=["이름","총 상점","총 벌점","순점수"])
-    else:
-        pos = sco_export[sco_export["점수"]>0].groupby("이름")["점수"].sum().rename("총 상점")
-        neg = sco_export[sco_export["점수"]<0].groupby("이름")["점수"].sum().rename("총 벌점")
-        net = sco_export.groupby("이름")["점수"].sum().rename("순점수")
-        summary = pd.concat([pos,neg,net], axis=1).fillna(0).reset_index()
-
-    bio = BytesIO()
-    with pd.ExcelWriter(bio, engine="openpyxl") as w:
-        stu_export.to_excel(w, "학생", index=False)
-        out_export.to_excel(w, "외출_외박", index=False)
-        sco_export.to_excel(w, "상벌점", index=False)
-        pay_export.to_excel(w, "납부", index=False)
-        summary.to_excel(w, "상벌점_요약", index=False)
-    return bio.getvalue()
+    })
+    return view[["ID","이름","학번","성별","호실","학생연락처","보호자연락처","주소","출신중학교","입사일","퇴사일","특이사항"]]
+
+def outings_view(df, students):
+    view = with_names(stored("Outings", df), students)
+    view = view.rename(columns={"Type":"구분","Reason":"사유","StartDate":"시작일","EndDate":"종료일","Status":"상태"})
+    return view[["ID","이름","구분","사유","시작일","종료일","상태"]]
+
+def rollcall_view(df, students):
+    info = students.set_index("ID")[["StudentNo","Room"]]
+    view = with_names(stored("Outings", df), students)
+    view["학번"] = view["StudentID"].map(info["StudentNo"])
+    view["호실"] = view["StudentID"].map(info["Room"])
+    view = view.rename(columns={"Type":"구분","Reason":"사유","StartDate":"시작일","EndDate":"종료일"})
+    return view[["호실","이름","학번","구분","시작일","종료일","사유"]].sort_values(["호실","이름"])
+
+def scores_view(df, students):
+    view = with_names(stored("Scores", df), students)
+    view = view.rename(columns={"Category":"구분","Points":"점수","Reason":"사유_비고","Date":"일자"})
+    return view[["ID","이름","구분","점수","사유_비고","일자"]]
+
+def payments_view(df, students):
+    view = with_names(stored("Payments", df), students)
+    view = view.rename(columns={"Period":"납부_회차_기간","Amount":"금액","Status":"상태","PayDate":"납부일","Method":"방법","Note":"비고"})
+    return view[["ID","이름","납부_회차_기간","금액","상태","납부일","방법","비고"]]
+
+# ================== 일괄 등록 ==================
+BULK_LABELS = {"Students": "학생", "Scores": "상벌점", "Payments": "납부"}
+TABLE_LABELS = dict(BULK_LABELS, Outings="외출·외박")
+
+def bulk_import(table, students, version, key):
+    # 파일 업로드 → 전체 검사 → 오류 보고 → 통과한 행을 한 번에 저장
+    label = BULK_LABELS[table]
+    with st.expander(f"{label} 일괄 등록 (CSV/XLSX)"):
+        st.download_button("양식 내려받기", template(table), file_name=f"{label}_양식.csv", mime="text/csv", key=f"{key}_tpl")
+        up = st.file_uploader("파일 선택", type=["csv","xlsx"], key=f"{key}_file")
+        if up is None:
+            return
+        base = form_base(key, version)
+        try:
+            rows, errors = validate(table, read_upload(up), students)
+        except ValueError as e:
+            st.error(str(e))
+            return
+        st.caption(f"등록 가능 {len(rows)}건 · 오류 {errors['행'].nunique()}행")
+        if len(errors):
+            st.dataframe(errors, use_container_width=True)
+            st.download_button("오류 목록 내려받기", errors.to_csv(index=False).encode("utf-8-sig"),
+                               file_name=f"{label}_오류.csv", mime="text/csv", key=f"{key}_err")
+        skip = st.checkbox("오류 행은 빼고 등록", key=f"{key}_skip") if len(errors) else True
+        if st.button(f"{len(rows)}건 등록", key=f"{key}_go", disabled=not (rows and skip)):
+            unique = ["StudentNo"] if table == "Students" else []
+            if write_or_error(bulk_insert, table, rows, base=base, unique=unique):
+                st.success(f"{len(rows)}건 등록 완료")
+                st.session_state.refresh = True
+
+# ================== 승인 대기열 ==================
+def run_transition(changes, base):
+    try:
+        done = transition(changes, base=base)
+    except ConflictError as e:
+        st.error(str(e))
+        return
+    asked = sum(len(v) for v in changes.values())
+    st.success(f"{done}건 처리 완료" + (f" (이미 처리된 {asked-done}건 제외)" if asked > done else ""))
+    st.session_state.refresh = True
+
+def approval_queue(outings, students, version):
+    st.markdown("### 승인 대기")
+    queue = pending_queue(outings, students)
+    if not len(queue):
+        st.info("처리할 신청이 없습니다.")
+        return
+    base = form_base("approval", version)
+    select_all = st.checkbox(f"전체 선택 ({len(queue)}건)", key="queue_all")
+    view = outings_view(queue, students)
+    view.insert(0, "선택", select_all)
+    edited = st.data_editor(view, key=f"queue_{version}_{select_all}", hide_index=True, use_container_width=True,
+                            disabled=[c for c in view.columns if c != "선택"])
+    ids = edited.loc[edited["선택"], "ID"].tolist()
+    cols = st.columns(len(STATUSES))
+    for col, status in zip(cols, STATUSES):
+        with col:
+            if st.button(f"선택 {status} ({len(ids)}건)", key=f"queue_{status}", disabled=not ids):
+                run_transition({status: ids}, base)
+
+    with st.expander("자동 처리 규칙"):
+        c1,c2 = st.columns(2)
+        with c1:
+            auto_ok = st.checkbox("짧은 외출 자동 승인", key="rule_ok")
+            hours = st.number_input("최대 시간 (날짜 단위 기록이라 당일 외출 = 24시간)", min_value=1, value=24, step=1, key="rule_hours")
+        with c2:
+            auto_no = st.checkbox("기간이 겹치는 신청 자동 반려 (승인된 외출·외박 또는 먼저 낸 신청과 겹침)", key="rule_no")
+        plan = plan_rules(outings, queue, max_hours=hours if auto_ok else None, reject_overlap=auto_no)
+        st.caption(f"적용 시 승인 {len(plan['승인'])}건 · 반려 {len(plan['반려'])}건")
+        if st.button("규칙 적용", key="rule_go", disabled=not (plan["승인"] or plan["반려"])):
+            run_transition(plan, base)
 
 # ================== 로그인 로직 ==================
 def login_admin(uid, pw):
@@ -107,9 +165,9 @@ def login_admin(uid, pw):
 
 def login_student(student_no, pw):
     students, *_ = load_all()
-    m = get_student_by_studentno(students, student_no)
-    if len(m)==1 and str(m.iloc[0]["Password"]) == str(pw):
-        return True, int(m.iloc[0]["ID"])
+    hit = credential_index(students).get(str(student_no))
+    if hit is not None and hit[1] == str(pw):
+        return True, hit[0]
     return False, None
 
 # ================== UI 렌더러 ==================
@@ -121,18 +179,41 @@ def render_logout():
         st.session_state.clear()
         st.session_state.refresh = True
 
+def diagnostics_panel():
+    # 최근 구간별 p50/p95 와 가장 느린 연산 (이 프로세스의 모든 세션 기준)
+    with st.sidebar.expander("성능 진단"):
+        stats = span_stats()
+        if not stats:
+            st.caption("아직 기록이 없습니다.")
+            return
+        st.caption("구간별 최근 소요 시간")
+        st.dataframe(stats, hide_index=True, use_container_width=True)
+        st.caption("가장 느린 연산")
+        st.dataframe(slowest(), hide_index=True, use_container_width=True)
+
 # ================== 관리자 화면 ==================
 def admin_screen():
     render_header()
     st.sidebar.markdown("**관리자 대시보드**")
     render_logout()
-
-    tab1, tab2, tab3, tab4, tab5 = st.tabs(["학생관리","외출·외박","상벌점","납부","보고서 다운로드"])
+    c = cache_stats(datetime.date.today().isoformat())
+    st.sidebar.caption(f"오늘 데이터 로드: 파싱 {c['parse']} · 캐시 적중 {c['hit']} · 무효화 {c['invalidate']}")
+    sync = sync_status()
+    if sync:
+        last = datetime.datetime.fromtimestamp(sync["last_sync"]).strftime("%H:%M:%S") if sync["last_sync"] else "-"
+        st.sidebar.caption(f"구글 시트 동기화: 보낼 변경 {sync['pending']}건 · 마지막 {last}"
+                           + (f" · 재시도 중({sync['failures']}회): {sync['last_error']}" if sync["failures"] else ""))
+    mem = memory_usage(load_all()).values()
+    st.sidebar.caption(f"메모리: {sum(m[0] for m in mem):,}행 · {sum(m[1] for m in mem) / 2**20:.1f}MB"
+                       f" (전부 문자열/객체일 때 {sum(m[2] for m in mem) / 2**20:.1f}MB)")
+    diagnostics_panel()
+
+    tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs(["학생관리","외출·외박","점호","상벌점","납부","보고서 다운로드"])
 
     # ---- 학생관리 ----
-    with tab1:
+    with tab1, span("tab:학생관리"):
         st.subheader("학생관리 (등록/수정/삭제)")
-        students, outings, scores, payments = load_all()
+        version, (students, outings, scores, payments) = load_versioned()
         with st.form("add_stu", clear_on_submit=True):
             c1,c2,c3 = st.columns(3)
             with c1:
@@ -155,36 +236,32 @@ def admin_screen():
             if sub:
                 if not (name and stu_no and pw):
                     st.error("이름/학번/비밀번호는 필수입니다.")
-                elif (students["StudentNo"].astype(str) == str(stu_no)).any():
+                elif student_no_exists(students, stu_no):
                     st.error("이미 존재하는 학번입니다.")
                 else:
-                    new = {"ID": next_id(students),"Name":name,"StudentNo":str(stu_no),"Gender":gender,
+                    new = {"Name":name,"StudentNo":str(stu_no),"Gender":gender,
                            "Room":room,"Phone":phone,"ParentPhone":pphone,"Address":address,
                            "MiddleSchool":middle,"InDate":in_date.isoformat(),
                            "OutDate": out_date if isinstance(out_date,str) else out_date.isoformat(),
                            "Password":pw,"Note":note}
-                    students = pd.concat([students, pd.DataFrame([new])], ignore_index=True)
-                    save_all(students, outings, scores, payments)
-                    st.success("학생 등록 완료")
-                    st.session_state.refresh = True
+                    if write_or_error(insert_row, "Students", new, unique=["StudentNo"]):
+                        st.success("학생 등록 완료")
+                        st.session_state.refresh = True
+
+        bulk_import("Students", students, version, "bulk_stu")
 
         # 학생 목록(한글 헤더)
-        students_view = students.rename(columns={
-            "Name":"이름","StudentNo":"학번","Gender":"성별","Room":"호실",
-            "Phone":"학생연락처","ParentPhone":"보호자연락처","Address":"주소",
-            "MiddleSchool":"출신중학교","InDate":"입사일","OutDate":"퇴사일","Note":"특이사항"
-        })
-        students_view = students_view[["ID","이름","학번","성별","호실","학생연락처","보호자연락처","주소","출신중학교","입사일","퇴사일","특이사항"]] if len(students_view) else students_view
         st.markdown("### 학생 목록")
-        st.dataframe(students_view, use_container_width=True)
+        paged_table(students, "stu_list", "Students", students, students_view,
+                    {"ID":"ID","이름":"Name","학번":"StudentNo","호실":"Room","입사일":"InDate"}, desc=False)
 
         st.markdown("### 학생 수정/삭제")
-        stu_no_list = students["StudentNo"].astype(str).tolist() if len(students) else []
-        sel = st.selectbox("수정/삭제할 학번 선택", stu_no_list) if stu_no_list else None
+        sel = student_picker(students, "edit_pick") if len(students) else None
         if sel:
             selected_df = get_student_by_studentno(students, sel)
             if not selected_df.empty:
                 row = selected_df.iloc[0]
+                base = form_base("edit_stu", version)
                 with st.form("edit_stu"):
                     c1,c2,c3 = st.columns(3)
                     with c1:
@@ -198,8 +275,8 @@ def admin_screen():
                     with c3:
                         address_e = st.text_area("주소", row["Address"])
                         middle_e = st.text_input("출신중학교", row["MiddleSchool"])
-                        in_e = st.date_input("입사일", datetime.date.fromisoformat(row["InDate"]) if row["InDate"] else datetime.date.today())
-                        out_e = st.date_input("퇴사일", datetime.date.fromisoformat(row["OutDate"]) if row["OutDate"] else datetime.date.today())
+                        in_e = st.date_input("입사일", date_or_today(row["InDate"]))
+                        out_e = st.date_input("퇴사일", date_or_today(row["OutDate"]))
                     note_e = st.text_area("특이사항", row["Note"])
                     pw_e = st.text_input("비밀번호(변경 시 입력)", value="", type="password")
                     c1b,c2b = st.columns(2)
@@ -210,72 +287,92 @@ def admin_screen():
                         dele = st.form_submit_button("학생 삭제")
 
                     if upd:
-                        idx = students.index[get_student_by_studentno(students, row["StudentNo"]).index][0]
-                        students.loc[idx, ["Name","StudentNo","Gender","Room","Phone","ParentPhone",
-                                           "Address","MiddleSchool","InDate","OutDate","Note"]] = [
+                        values = dict(zip(["Name","StudentNo","Gender","Room","Phone","ParentPhone",
+                                           "Address","MiddleSchool","InDate","OutDate","Note"], [
                             name_e, str(stu_no_e), gender_e, room_e, phone_e, pphone_e, address_e, middle_e,
                             in_e.isoformat(), out_e.isoformat(), note_e
-                        ]
+                        ]))
                         if pw_e:
-                            students.loc[idx,"Password"] = pw_e
+                            values["Password"] = pw_e
                         # 학번이 바뀌면 연관 데이터의 StudentID는 그대로 (ID 매칭) 이므로 영향 없음
-                        save_all(students, outings, scores, payments)
-                        st.success("수정 완료")
-                        st.session_state.refresh = True
+                        if write_or_error(update_row, "Students", int(row["ID"]), values, base=base):
+                            st.success("수정 완료")
+                            st.session_state.refresh = True
 
                     if dele:
-                        sid = int(row["ID"])
-                        students = students[students["ID"]!=sid].copy()
-                        if del_related:
-                            outings = outings[outings["StudentID"]!=sid].copy()
-                            scores = scores[scores["StudentID"]!=sid].copy()
-                            payments = payments[payments["StudentID"]!=sid].copy()
-                        save_all(students, outings, scores, payments)
-                        st.warning("삭제 완료")
-                        st.session_state.refresh = True
+                        if write_or_error(delete_student, int(row["ID"]), cascade=del_related, base=base):
+                            st.warning("삭제 완료")
+                            st.session_state.refresh = True
             else:
                 st.warning("선택한 학번을 찾을 수 없습니다.")
 
     # ---- 외출·외박 ----
-    with tab2:
+    with tab2, span("tab:외출·외박"):
         st.subheader("외출·외박 관리")
-        students, outings, scores, payments = load_all()
+        version, (students, outings, scores, payments) = load_versioned()
         if len(students)==0:
             st.info("학생을 먼저 등록하세요.")
         else:
             with st.form("add_outing"):
-                sid = st.selectbox("학생 선택", students["ID"].tolist(), format_func=lambda x: name_by_sid(students, x))
+                sid = st.selectbox("학생 선택", students["ID"].tolist(), format_func=name_index(students).get)
                 otype = st.radio("구분", ["외출","외박"], horizontal=True)
                 reason = st.text_area("사유")
                 c1,c2 = st.columns(2)
                 with c1: s = st.date_input("시작일", datetime.date.today())
                 with c2: e = st.date_input("종료일", datetime.date.today())
                 status = st.selectbox("상태", ["신청","대기","승인","반려","취소"])
+                force = st.checkbox("기간이 겹치는 내역이 있어도 등록")
                 sub = st.form_submit_button("등록")
                 if sub:
-                    new = {"ID": next_id(outings),"StudentID": int(sid),"Type": otype,"Reason": reason,
+                    new = {"StudentID": int(sid),"Type": otype,"Reason": reason,
                            "StartDate": s.isoformat(),"EndDate": e.isoformat(),"Status": status}
-                    outings = pd.concat([outings, pd.DataFrame([new])], ignore_index=True)
-                    save_all(students, outings, scores, payments)
-                    st.success("저장 완료")
-                    st.session_state.refresh = True
+                    dup = overlapping_outings(outings, int(sid), s, e)
+                    if len(dup) and not force:
+                        st.warning(f"기간이 겹치는 신청/승인 내역이 {len(dup)}건 있습니다 (ID: {', '.join(map(str, dup['ID'].tolist()))}).")
+                    elif write_or_error(insert_row, "Outings", new):
+                        st.success("저장 완료")
+                        st.session_state.refresh = True
+
+        approval_queue(outings, students, version)
 
         if len(outings):
-            view = outings.copy()
-            view["이름"] = view["StudentID"].apply(lambda x: name_by_sid(students, x))
-            view = view.rename(columns={"Type":"구분","Reason":"사유","StartDate":"시작일","EndDate":"종료일","Status":"상태"})
-            view = view[["ID","이름","구분","사유","시작일","종료일","상태"]]
-            st.dataframe(view, use_container_width=True)
+            paged_table(outings, "out_list", "Outings", students, lambda d: outings_view(d, students),
+                        {"ID":"ID","시작일":"StartDate","종료일":"EndDate","상태":"Status"},
+                        choice=("Status","상태"), dates=("StartDate","EndDate","외출·외박"))
+
+    # ---- 점호 ----
+    with tab3, span("tab:점호"):
+        st.subheader("점호 (외출·외박 부재 현황)")
+        students, outings, scores, payments = load_all()
+        c1,c2,c3 = st.columns(3)
+        with c1:
+            day = st.date_input("날짜", datetime.date.today(), key="roll_day")
+        with c2:
+            until = st.date_input("종료일 (기간 조회)", day, key="roll_until") if st.checkbox("기간으로 조회", key="roll_range") else None
+        with c3:
+            night = st.checkbox("외박만 (야간 점호)", value=True, key="roll_night")
+        students = residents_on(students, day, until)
+        away = away_on(outings, day, until, night=night)
+        away = away[away["StudentID"].isin(students["ID"])]
+        away_ids = away["StudentID"].unique()
+        st.caption(f"부재 {len(away_ids)}명 · 재실 {len(students) - students['ID'].isin(away_ids).sum()}명 (승인된 외출·외박 기준)")
+        if len(away):
+            st.dataframe(rollcall_view(away, students), use_container_width=True, hide_index=True)
+        else:
+            st.info("해당 날짜에 나가 있는 학생이 없습니다.")
+        st.markdown("### 호실별 재실 인원")
+        st.dataframe(room_occupancy(students, away_ids), use_container_width=True, hide_index=True)
 
     # ---- 상벌점 ----
-    with tab3:
+    with tab4, span("tab:상벌점"):
         st.subheader("상벌점 관리")
-        students, outings, scores, payments = load_all()
+        version, (students, outings, scores, payments) = load_versioned()
         if len(students)==0:
             st.info("학생을 먼저 등록하세요.")
         else:
+            bulk_import("Scores", students, version, "bulk_sco")
             with st.form("add_score"):
-                sid = st.selectbox("학생 선택", students["ID"].tolist(), format_func=lambda x: name_by_sid(students, x))
+                sid = st.selectbox("학생 선택", students["ID"].tolist(), format_func=name_index(students).get)
                 category = st.radio("구분", ["상점","벌점"], horizontal=True)
                 pts = st.number_input("점수", value=1, step=1)
                 reason = st.text_area("사유/비고")
@@ -283,29 +380,27 @@ def admin_screen():
                 sub = st.form_submit_button("등록")
                 if sub:
                     p = int(pts if category=="상점" else -abs(pts))
-                    new = {"ID": next_id(scores),"StudentID": int(sid),"Category": category,
+                    new = {"StudentID": int(sid),"Category": category,
                            "Points": p,"Reason": reason,"Date": d.isoformat()}
-                    scores = pd.concat([scores, pd.DataFrame([new])], ignore_index=True)
-                    save_all(students, outings, scores, payments)
-                    st.success("저장 완료")
-                    st.session_state.refresh = True
+                    if write_or_error(insert_row, "Scores", new):
+                        st.success("저장 완료")
+                        st.session_state.refresh = True
 
         if len(scores):
-            view = scores.copy()
-            view["이름"] = view["StudentID"].apply(lambda x: name_by_sid(students, x))
-            view = view.rename(columns={"Category":"구분","Points":"점수","Reason":"사유_비고","Date":"일자"})
-            view = view[["ID","이름","구분","점수","사유_비고","일자"]]
-            st.dataframe(view, use_container_width=True)
+            paged_table(scores, "sco_list", "Scores", students, lambda d: scores_view(d, students),
+                        {"ID":"ID","일자":"Date","점수":"Points"},
+                        choice=("Category","구분"), dates=("Date",None,"일자"))
 
     # ---- 납부 ----
-    with tab4:
+    with tab5, span("tab:납부"):
         st.subheader("기숙사비 납부 관리")
-        students, outings, scores, payments = load_all()
+        version, (students, outings, scores, payments) = load_versioned()
         if len(students)==0:
             st.info("학생을 먼저 등록하세요.")
         else:
+            bulk_import("Payments", students, version, "bulk_pay")
             with st.form("add_pay"):
-                sid = st.selectbox("학생 선택", students["ID"].tolist(), format_func=lambda x: name_by_sid(students, x))
+                sid = st.selectbox("학생 선택", students["ID"].tolist(), format_func=name_index(students).get)
                 period = st.text_input("납부 회차/기간")
                 amount = st.number_input("금액", min_value=0, step=10000)
                 status = st.radio("상태", ["납부","미납"], horizontal=True)
@@ -314,41 +409,89 @@ def admin_screen():
                 note = st.text_area("비고")
                 sub = st.form_submit_button("등록")
                 if sub:
-                    new = {"ID": next_id(payments),"StudentID": int(sid),"Period": period,
+                    new = {"StudentID": int(sid),"Period": period,
                            "Amount": int(amount),"Status": status,"PayDate": pay_date.isoformat(),
                            "Method": method,"Note": note}
-                    payments = pd.concat([payments, pd.DataFrame([new])], ignore_index=True)
-                    save_all(students, outings, scores, payments)
-                    st.success("저장 완료")
-                    st.session_state.refresh = True
+                    if write_or_error(insert_row, "Payments", new):
+                        st.success("저장 완료")
+                        st.session_state.refresh = True
 
         if len(payments):
-            view = payments.copy()
-            view["이름"] = view["StudentID"].apply(lambda x: name_by_sid(students, x))
-            view = view.rename(columns={"Period":"납부_회차_기간","Amount":"금액","Status":"상태","PayDate":"납부일","Method":"방법","Note":"비고"})
-            view = view[["ID","이름","납부_회차_기간","금액","상태","납부일","방법","비고"]]
-            st.dataframe(view, use_container_width=True)
+            paged_table(payments, "pay_list", "Payments", students, lambda d: payments_view(d, students),
+                        {"ID":"ID","납부일":"PayDate","금액":"Amount"},
+                        choice=("Status","상태"), dates=("PayDate",None,"납부일"))
 
     # ---- 보고서 ----
-    with tab5:
-        st.subheader("엑셀 보고서 다운로드")
-        students, outings, scores, payments = load_all()
-        data = make_report(students, outings, scores, payments)
-        st.download_button("📥 보고서 다운로드", data, file_name="report.xlsx",
-                           mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+    with tab6, span("tab:보고서 다운로드"):
+        st.subheader("보고서 다운로드")
+        version, (students, outings, scores, payments) = load_versioned()
+        c1,c2,c3 = st.columns(3)
+        with c1:
+            today = datetime.date.today()
+            rng = st.date_input("기간", (today.replace(day=1), today)) if st.checkbox("기간 지정") else ()
+        with c2:
+            picked = st.multiselect("학생 (비우면 전체)", students["ID"].tolist(), format_func=name_index(students).get)
+        with c3:
+            fmts = ["xlsx","csv"] + (["parquet"] if parquet_available() else [])
+            fmt = st.radio("형식", fmts, horizontal=True,
+                           format_func={"xlsx":"엑셀","csv":"CSV(zip)","parquet":"Parquet(zip)"}.get)
+        start, end = (rng[0].isoformat(), rng[1].isoformat()) if len(rng)==2 else (None, None)
+        params = (fmt, start, end, tuple(picked))
+        # 요청할 때만 생성 (같은 데이터 버전·조건이면 캐시 재사용)
+        if archived_years():
+            st.caption("기간을 지정하지 않으면 마감되지 않은 기록만 포함됩니다. 마감한 학년도에 걸치는 기간을 지정하면 보관 기록도 함께 조회합니다.")
+        if st.button("보고서 만들기"):
+            # 기간이 마감한 학년도에 걸칠 때만 보관 파일을 읽어 합침
+            data = make_report(*with_archive((students, outings, scores, payments), start, end), fmt=fmt,
+                               start=start, end=end, student_ids=picked or None)
+            st.session_state.report = {"params": params, "version": version, "data": data}
+        rep = st.session_state.get("report")
+        if rep and rep["params"] == params:
+            if rep["version"] != version:
+                st.caption("보고서를 만든 뒤 데이터가 바뀌었습니다. 다시 만들면 최신 내용이 반영됩니다.")
+            file_name, mime = REPORT_FORMATS[fmt]
+            st.download_button("📥 보고서 다운로드", rep["data"], file_name=file_name, mime=mime)
+
+        close_year_panel()
+
+def close_year_panel():
+    with st.expander("학년도 마감 (지난 기록 보관)"):
+        current = academic_year(datetime.date.today())
+        done = archived_years()
+        st.caption("마감하면 그 학년도까지 끝난 외출·외박(신청/대기 제외)·상벌점·납부(미납 제외) 기록과 그 전에 퇴사한 학생을 "
+                   "보관 파일로 옮깁니다. 목록 화면에서는 보이지 않고, 보고서에서 해당 기간을 지정하거나 학생 화면에서 "
+                   f"학년도를 고르면 조회됩니다. 보관된 학년도: {', '.join(map(str, done)) or '없음'}")
+        year = st.selectbox("마감할 학년도", list(range(current - 1, current - 6, -1)),
+                            format_func=lambda y: f"{y}학년도 ({year_range(y)[0]} ~ {year_range(y)[1]})")
+        ok = st.checkbox("보관된 기록은 목록/수정 화면에서 빠지는 것을 확인했습니다")
+        if st.button("학년도 마감", disabled=not ok):
+            moved = close_year(year)
+            if any(moved.values()):
+                st.success("보관 완료: " + " · ".join(f"{TABLE_LABELS[n]} {k}건" for n, k in moved.items()))
+                st.session_state.refresh = True
+            else:
+                st.info("옮길 기록이 없습니다.")
 
 # ================== 학생 화면 ==================
 def student_screen(sid:int):
     render_header()
-    students, outings, scores, payments = load_all()
+    version, (students, outings, scores, payments) = load_versioned()
     myname = name_by_sid(students, sid) or "학생"
     st.sidebar.markdown(f"**학생 대시보드: {myname}**")
     render_logout()
+    # 지난 학년도를 고르면 그 학년도의 보관 기록을 보여줌 (신청/취소는 항상 현재 기록 기준)
+    years = sorted(archived_years(), reverse=True)
+    year = st.sidebar.selectbox("조회 학년도", [None] + years, format_func=lambda y: "현재" if y is None else f"{y}학년도") if years else None
+    h_outings, h_scores, h_payments = (outings, scores, payments) if year is None else year_tables(year)
+
+    def my_rows(df, table):
+        # 보관 기록은 학생별 인덱스를 만들지 않고 바로 거름 (현재 기록의 인덱스를 밀어내지 않도록)
+        return student_rows(df, table, sid) if year is None else df[df["StudentID"] == sid]
 
     tab1, tab2, tab3 = st.tabs(["외출·외박 신청/취소","나의 상벌점","나의 납부 내역"])
 
     # 외출·외박 신청/취소
-    with tab1:
+    with tab1, span("tab:외출·외박 신청/취소"):
         st.subheader("외출·외박 신청")
         with st.form("req_out"):
             otype = st.radio("구분", ["외출","외박"], horizontal=True)
@@ -358,72 +501,72 @@ def student_screen(sid:int):
             with c2: e = st.date_input("종료일", datetime.date.today())
             sub = st.form_submit_button("신청")
             if sub:
-                new = {"ID": next_id(outings),"StudentID": int(sid),"Type": otype,"Reason": reason,
+                new = {"StudentID": int(sid),"Type": otype,"Reason": reason,
                        "StartDate": s.isoformat(),"EndDate": e.isoformat(),"Status": "신청"}
-                outings = pd.concat([outings, pd.DataFrame([new])], ignore_index=True)
-                save_all(students, outings, scores, payments)
-                st.success("신청 완료")
-                st.session_state.refresh = True
+                if e < s:
+                    st.error("종료일이 시작일보다 빠릅니다.")
+                elif len(overlapping_outings(outings, int(sid), s, e)):
+                    st.error("이미 신청했거나 승인된 기간과 겹칩니다. 내 신청 내역을 확인하세요.")
+                elif write_or_error(insert_row, "Outings", new):
+                    st.success("신청 완료")
+                    st.session_state.refresh = True
 
-        mine = outings[outings["StudentID"]==sid].copy().sort_values("ID", ascending=False)
+        mine = stored("Outings", my_rows(h_outings, "Outings").sort_values("ID", ascending=False))
         st.markdown("### 내 신청 내역")
         if len(mine):
             view = mine.rename(columns={"Type":"구분","Reason":"사유","StartDate":"시작일","EndDate":"종료일","Status":"상태"})
             view = view[["ID","구분","사유","시작일","종료일","상태"]]
             st.dataframe(view, use_container_width=True)
 
-            pend = mine[mine["Status"].isin(["신청","대기"])]
+            pend = mine[mine["Status"].isin(PENDING)]
             if len(pend):
                 labels = [f"{int(r.ID)} | {r.Type} {r.StartDate}~{r.EndDate} | {r.Status}" for _, r in pend.iterrows()]
                 sel = st.selectbox("취소할 신청 선택 (ID | 유형 기간 | 상태)", labels) if len(labels) else None
+                base = form_base("cancel_outing", version)
                 if st.button("신청 취소"):
                     if sel:
                         cancel_id = int(sel.split("|")[0].strip())
-                        idxs = outings.index[outings["ID"]==cancel_id].tolist()
-                        if idxs:
-                            outings.loc[idxs[0],"Status"] = "취소"
-                            save_all(students, outings, scores, payments)
-                            st.success("취소되었습니다.")
-                            st.session_state.refresh = True
+                        if (outings["ID"]==cancel_id).any():
+                            # 그 사이 관리자가 처리했더라도 아직 신청/대기 상태면 취소 가능
+                            if write_or_error(update_row, "Outings", cancel_id, {"Status": "취소"}, base=base,
+                                              expect={"Status": PENDING}):
+                                st.success("취소되었습니다.")
+                                st.session_state.refresh = True
             else:
                 st.info("취소 가능한(신청/대기) 내역이 없습니다.")
         else:
             st.info("신청 내역이 없습니다.")
 
     # 나의 상벌점
-    with tab2:
+    with tab2, span("tab:나의 상벌점"):
         st.subheader("나의 상벌점 조회")
-        mine = scores[scores["StudentID"]==sid].copy().sort_values("ID", ascending=False)
+        mine = stored("Scores", my_rows(h_scores, "Scores").sort_values("ID", ascending=False))
         if len(mine):
             view = mine.rename(columns={"Category":"구분","Points":"점수","Reason":"사유_비고","Date":"일자"})
             view = view[["구분","점수","사유_비고","일자"]]
             st.dataframe(view, use_container_width=True)
-            pos = mine[mine["Points"]>0]["Points"].sum()
-            neg = mine[mine["Points"]<0]["Points"].sum()
-            st.write(f"총 상점: **{int(pos)}**점 | 총 벌점: **{int(neg)}**점 | 순점수: **{int(mine['Points'].sum())}**점")
+            agg = student_stats(scores, payments, sid) if year is None else \
+                student_totals(my_rows(h_scores, "Scores"), my_rows(h_payments, "Payments"))
+            st.write(f"총 상점: **{agg['pos']}**점 | 총 벌점: **{agg['neg']}**점 | 순점수: **{agg['net']}**점")
         else:
             st.info("상벌점 기록이 없습니다.")
 
     # 나의 납부 내역
-    with tab3:
+    with tab3, span("tab:나의 납부 내역"):
         st.subheader("나의 납부 내역")
-        mine = payments[payments["StudentID"]==sid].copy().sort_values("ID", ascending=False)
+        mine = stored("Payments", my_rows(h_payments, "Payments").sort_values("ID", ascending=False))
         if len(mine):
             view = mine.rename(columns={"Period":"납부_회차_기간","Amount":"금액","Status":"상태","PayDate":"납부일","Method":"방법","Note":"비고"})
             view = view[["납부_회차_기간","금액","상태","납부일","방법","비고"]]
             st.dataframe(view, use_container_width=True)
+            agg = student_stats(scores, payments, sid) if year is None else \
+                student_totals(my_rows(h_scores, "Scores"), my_rows(h_payments, "Payments"))
+            st.write(f"납부 합계: **{agg['paid']:,}**원 | 미납 합계: **{agg['unpaid']:,}**원")
         else:
             st.info("납부 기록이 없습니다.")
 
-# ================== 엔트리 ==================
-if "role" not in st.session_state:
-    st.session_state.role = None
-if "sid" not in st.session_state:
-    st.session_state.sid = None
-if "refresh" not in st.session_state:
-    st.session_state.refresh = False
-
-if st.session_state.role is None:
+# ================== 로그인 화면 ==================
+def login_screen():
     render_header()
     st.subheader("로그인")
     who = st.radio("사용자 유형", ["관리자","학생"], horizontal=True)
@@ -451,13 +594,27 @@ if st.session_state.role is None:
         st.rerun()
     st.stop()
 
-# 라우팅
-if st.session_state.role == "admin":
-    admin_screen()
-elif st.session_state.role == "student":
-    student_screen(int(st.session_state.sid))
-
-# 최종 refresh 처리
-if st.session_state.get("refresh", False):
-    st.session_state["refresh"] = False
-    st.rerun()
+# ================== 엔트리 ==================
+if "role" not in st.session_state:
+    st.session_state.role = None
+if "sid" not in st.session_state:
+    st.session_state.sid = None
+if "refresh" not in st.session_state:
+    st.session_state.refresh = False
+if "session" not in st.session_state:
+    st.session_state.session = uuid.uuid4().hex[:8]
+
+# 라우팅 (rerun 한 번의 구간 시간은 timing.jsonl 로)
+role = st.session_state.role
+with rerun(st.session_state.session, role, role or "login"):
+    if role is None:
+        login_screen()
+    elif role == "admin":
+        admin_screen()
+    elif role == "student":
+        student_screen(int(st.session_state.sid))
+
+    # 최종 refresh 처리
+    if st.session_state.get("refresh", False):
+        st.session_state["refresh"] = False
+        st.rerun()
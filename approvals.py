@@ -0,0 +1,47 @@
+import pandas as pd
+
+import storage
+from indexes import filter_rows, value_rows
+
+# ================== 외출·외박 승인 ==================
+# 대기열은 Status 값 인덱스(value_rows)에서 신청/대기 행만 꺼내고, 상태 변경은 선택한 행 전체를
+# update_many 한 명령으로 보낸다. 그 사이 학생이 취소하는 등 이미 처리된 행은 건너뛴다.
+PENDING = ["신청","대기"]
+STATUSES = ["승인","반려","취소"]
+
+def pending_queue(outings, students):
+    # 신청/대기 행 (시작일, ID 순)
+    pos = filter_rows(outings, "Outings", students, "", "Status", PENDING)
+    return outings.iloc[pos].sort_values(["StartDate", "ID"], kind="stable")
+
+def short_outings(queue, max_hours):
+    # 기간이 max_hours 이하인 외출의 ID. 기록이 날짜 단위이므로 하루 = 24시간으로 센다
+    out = queue[queue["Type"] == "외출"]
+    days = (pd.to_datetime(out["EndDate"], errors="coerce") - pd.to_datetime(out["StartDate"], errors="coerce")).dt.days + 1
+    return out.loc[days.notna() & (days * 24 <= max_hours), "ID"].tolist()
+
+def overlapping(outings, queue):
+    # 같은 학생의 승인된 외출·외박, 또는 먼저 들어온(ID 가 작은) 대기 신청과 기간이 겹치는 신청의 ID
+    cols = ["ID", "StudentID", "StartDate", "EndDate"]
+    approved = outings.iloc[value_rows(outings, "Outings", "Status").get("승인", [])]
+    approved = approved[approved["StudentID"].isin(queue["StudentID"])]
+    m = queue[cols].merge(pd.concat([approved[cols], queue[cols]]), on="StudentID", suffixes=("", "_o"))
+    m = m[m["ID_o"].isin(approved["ID"]) | (m["ID_o"] < m["ID"])]
+    hit = (m["StartDate"] <= m["EndDate_o"]) & (m["EndDate"] >= m["StartDate_o"])
+    return sorted(set(m.loc[hit, "ID"].tolist()))
+
+def plan_rules(outings, queue, max_hours=None, reject_overlap=False):
+    # 규칙 적용 결과 {상태: [ID, ...]}. 겹침 반려가 자동 승인보다 우선
+    rejected = overlapping(outings, queue) if reject_overlap else []
+    approved = short_outings(queue, max_hours) if max_hours else []
+    skip = set(rejected)
+    return {"승인": [i for i in approved if i not in skip], "반려": rejected}
+
+def transition(changes, base=None):
+    # {상태: [ID, ...]} 를 한 번의 쓰기로 적용 → 실제로 바뀐 행 수 (아직 신청/대기인 행만 바뀜)
+    ops = [{"op": "update_many", "table": "Outings", "ids": [int(i) for i in ids],
+            "values": {"Status": status}, "expect": {"Status": PENDING}}
+           for status, ids in changes.items() if len(ids)]
+    if not ops:
+        return 0
+    return sum(len(op["ids"]) for op in storage.apply(ops, base))
@@ -0,0 +1,205 @@
+import datetime
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import pandas as pd
+
+import storage
+from storage import TABLES, max_id, stored, text_dtypes, typed
+
+log = logging.getLogger(__name__)
+
+# ================== 학년도 보관 ==================
+# 마감한 학년도의 외출·외박/상벌점/납부 기록은 archive/<학년도>.xlsx 로, 그 전에 퇴사한 학생은 archive/students.xlsx 로
+# 옮겨서 평소의 load_all()/save_all()/보고서는 진행 중인 기록(hot)만 다룬다. 보관 파일은 마감할 때만 쓰고 그 외에는 읽기 전용.
+# archive/index.json 에 학년도별 기록의 날짜 범위를 두어, 조회 기간이 걸치는 학년도의 파일만 읽는다.
+# 보관 파일을 먼저 쓰고 hot 에서 지우므로, 중간에 멈추면 같은 ID 가 양쪽에 남을 수 있다 → 합칠 때 hot 우선,
+# 다시 마감하면 ID 기준으로 덮어써서 중복되지 않는다.
+YEAR_START_MONTH = 3   # 학년도 시작 월
+HISTORY = {"Outings": ("StartDate", "EndDate"), "Scores": ("Date", None), "Payments": ("PayDate", None)}   # 테이블 -> (기준일, 종료일)
+OPEN = {"Outings": ("Status", ["신청","대기"]), "Payments": ("Status", ["미납"])}   # 끝나지 않은 기록 → 마감해도 hot 에 남김
+COMBINED_CACHE_SIZE = 4
+
+_lock = threading.Lock()
+_files = {}                  # 경로 -> ((mtime, 크기), 값)
+_combined = OrderedDict()    # (hot 프레임 id, 학년도들) -> (hot 프레임, 합친 tables)
+
+def academic_year(day):
+    day = pd.Timestamp(day)
+    return day.year if day.month >= YEAR_START_MONTH else day.year - 1
+
+def year_range(year):
+    # 학년도 → (첫날, 마지막 날) 'YYYY-MM-DD'
+    first = datetime.date(year, YEAR_START_MONTH, 1)
+    last = datetime.date(year + 1, YEAR_START_MONTH, 1) - datetime.timedelta(days=1)
+    return first.isoformat(), last.isoformat()
+
+def _years(s):
+    # 날짜 Series → 학년도 Series
+    return s.dt.year - (s.dt.month < YEAR_START_MONTH).astype(int)
+
+def _dir():
+    return Path(storage.ARCHIVE_DIR)
+
+def _year_file(year):
+    return _dir() / f"{year}.xlsx"
+
+# ---- 읽기 (파일 mtime 이 같으면 다시 파싱하지 않음) ----
+def _cached(path, load):
+    try:
+        s = path.stat()
+    except FileNotFoundError:
+        return None
+    key = (s.st_mtime_ns, s.st_size)
+    with _lock:
+        hit = _files.get(path)
+        if hit is not None and hit[0] == key:
+            return hit[1]
+    value = load()
+    with _lock:
+        _files[path] = (key, value)
+    return value
+
+def _empty(name):
+    return typed(name, pd.DataFrame(columns=TABLES[name]))
+
+def _read(path, names):
+    # 보관 파일 → {테이블: DataFrame} (파일이 없으면 빈 프레임)
+    def load():
+        xls = pd.ExcelFile(path, engine="openpyxl")
+        return {n: typed(n, pd.read_excel(xls, n, dtype=text_dtypes(n))) for n in names}
+    return _cached(path, load) or {n: _empty(n) for n in names}
+
+def archived_years():
+    # 보관된 학년도 -> {"start": 가장 이른 기준일, "end": 가장 늦은 종료일}
+    path = _dir() / "index.json"
+    data = _cached(path, lambda: json.loads(path.read_text(encoding="utf-8"))) or {}
+    return {int(y): v for y, v in data.items()}
+
+def year_tables(year):
+    # 보관된 학년도 하나의 (외출·외박, 상벌점, 납부)
+    frames = _read(_year_file(year), list(HISTORY))
+    return tuple(frames[n] for n in HISTORY)
+
+def archived_students():
+    return _read(_dir() / "students.xlsx", ["Students"])["Students"]
+
+def student_totals(scores, payments):
+    # 보관 기록(한 학생 분)의 상벌점/납부 합계 — student_stats() 와 같은 키
+    pts, amt = scores["Points"].fillna(0), payments["Amount"].fillna(0)
+    pos, neg = int(pts[pts > 0].sum()), int(pts[pts < 0].sum())
+    return {"pos": pos, "neg": neg, "net": pos + neg,
+            "paid": int(amt[payments["Status"] == "납부"].sum()), "unpaid": int(amt[payments["Status"] == "미납"].sum())}
+
+# ---- 기간 조회 ----
+def years_for(start=None, end=None):
+    # 'YYYY-MM-DD' 기간에 기록이 걸치는 보관 학년도 (기간을 지정하지 않은 조회는 hot 만 봄)
+    if not (start or end):
+        return []
+    start, end = start or "", end or "9999-12-31"
+    return sorted(y for y, r in archived_years().items() if r["start"] <= end and r["end"] >= start)
+
+def _concat(name, frames):
+    # 같은 ID 는 뒤쪽 프레임 우선 (보관과 hot 에 모두 있으면 hot). 내용까지 다르면 다른 행이 ID 를 나눠 쓴 것이므로 경고
+    frames = [f for f in frames if len(f)]
+    if not frames:
+        return _empty(name)
+    df = pd.concat(frames, ignore_index=True)
+    dup = df[df["ID"].duplicated(keep=False)]
+    if len(dup):
+        clash = dup.astype(str).drop_duplicates()
+        clash = sorted(set(clash.loc[clash["ID"].duplicated(), "ID"]), key=int)
+        if clash:
+            log.warning("%s: 보관 기록과 진행 중인 기록의 ID 가 겹칩니다 (진행 중인 행을 씀): %s", name, clash[:20])
+    df = df.drop_duplicates("ID", keep="last")
+    return typed(name, df.sort_values("ID", kind="stable").reset_index(drop=True), full=False)
+
+def with_archive(tables, start=None, end=None):
+    # 기간이 보관된 학년도에 걸치면 그 기록과 퇴사 학생을 합친 tables, 아니면 tables 그대로
+    years = years_for(start, end)
+    if not years:
+        return tables
+    key = (tuple(map(id, tables)), tuple(years))
+    with _lock:
+        hit = _combined.get(key)
+        if hit is not None and all(a is b for a, b in zip(hit[0], tables)):
+            _combined.move_to_end(key)
+            return hit[1]
+    old = [year_tables(y) for y in years]
+    out = [_concat("Students", [archived_students(), tables[0]])]
+    for i, name in enumerate(HISTORY):
+        out.append(_concat(name, [o[i] for o in old] + [tables[1 + i]]))
+    out = tuple(out)
+    with _lock:
+        _combined[key] = (tables, out)
+        while len(_combined) > COMBINED_CACHE_SIZE:
+            _combined.popitem(last=False)
+    return out
+
+# ---- 학년도 마감 ----
+def _write(path, frames):
+    # 임시 파일에 쓰고 교체. 마감 외에는 쓰지 않는 파일이라 읽기 전용으로 둔다
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    with pd.ExcelWriter(tmp, engine="openpyxl") as w:
+        for name, df in frames.items():
+            stored(name, df).to_excel(w, sheet_name=name, index=False)
+    with open(tmp, "rb+") as f:
+        os.fsync(f.fileno())
+    if path.exists():
+        path.chmod(0o644)
+    os.replace(tmp, path)
+    path.chmod(0o444)
+
+def _store(moved):
+    # 옮길 행을 기준일의 학년도 파일에 합쳐 쓰고 index.json 갱신
+    index = {str(y): r for y, r in archived_years().items()}
+    years = set()
+    for name, (col, _) in HISTORY.items():
+        years.update(_years(moved[name][col]).unique().tolist())
+    for year in sorted(years):
+        old = _read(_year_file(year), list(HISTORY))
+        frames = {n: _concat(n, [old[n], moved[n][_years(moved[n][col]) == year]]) for n, (col, _) in HISTORY.items()}
+        _write(_year_file(year), frames)
+        starts = [f[col].min() for f, (col, _) in zip(frames.values(), HISTORY.values()) if len(f)]
+        ends = [f[end or col].max() for f, (col, end) in zip(frames.values(), HISTORY.values()) if len(f)]
+        index[str(year)] = {"start": min(starts).date().isoformat(), "end": max(ends).date().isoformat()}
+    if len(moved["Students"]):
+        _write(_dir() / "students.xlsx", {"Students": _concat("Students", [archived_students(), moved["Students"]])})
+    path = _dir() / "index.json"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(dict(sorted(index.items())), ensure_ascii=False, indent=1), encoding="utf-8")
+    os.replace(tmp, path)
+
+def close_year(year, today=None):
+    # year 학년도까지 끝난 기록과 그 전에 퇴사한 학생(남은 기록이 없는)을 보관 파일로 옮김 → {테이블: 옮긴 행 수}
+    if year >= academic_year(today or datetime.date.today()):
+        raise ValueError("진행 중인 학년도는 마감할 수 없습니다.")
+    boundary = pd.Timestamp(year_range(year + 1)[0])
+
+    def move(tables):
+        t = dict(zip(TABLES, tables))
+        for name, df in t.items():   # 가장 큰 ID 가 보관 파일로 빠져도 시퀀스가 그 ID 를 다시 내주지 않도록
+            storage.backend().reserve(name, 0, floor=max_id(df))
+        moved, keep = {}, dict(t)
+        for name, (col, end) in HISTORY.items():
+            df = t[name]
+            m = (df[col] < boundary) & (df[end or col] < boundary)   # 빈 날짜(NaT)는 남김
+            if name in OPEN:
+                m &= ~df[OPEN[name][0]].isin(OPEN[name][1])
+            moved[name], keep[name] = df[m], df[~m]
+        stu = t["Students"]
+        left = pd.concat([keep[n]["StudentID"] for n in HISTORY])
+        m = (stu["OutDate"] < boundary) & ~stu["ID"].isin(left)
+        moved["Students"], keep["Students"] = stu[m], stu[~m]
+        if not any(len(df) for df in moved.values()):
+            return tables, {n: 0 for n in TABLES}
+        _store(moved)
+        return tuple(keep[n] for n in TABLES), {n: len(moved[n]) for n in TABLES}
+
+    return storage.rewrite(move)
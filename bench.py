@@ -0,0 +1,245 @@
+import argparse
+import ast
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import storage
+import report
+from storage import TABLES, typed
+
+# ================== 벤치마크 ==================
+# 가짜 기숙사 데이터(학생/외출·외박/상벌점/납부)를 원하는 규모로 만들어 임시 폴더에 저장한 뒤
+# load_all / save_all / next_id / login_student / make_report 와 관리자·학생 화면 rerun(스트림릿 AppTest)을 재고
+# 결과를 JSON 으로 낸다. 네트워크 없이 돌아가며, 버전 사이 비교는 --compare 이전결과.json
+#   python bench.py --students 1000 --scores 100000 --out bench.json
+#   python bench.py --backend excel --students 300 --scores 5000 --compare bench.json
+APP = Path(__file__).with_name("app.py")
+ADMIN = ("admin", "admin123")
+PASSWORD = "1234"   # 가짜 학생 비밀번호
+YEAR = 2025         # 가짜 데이터의 학년도
+
+SURNAMES = list("김이박최정강조윤장임한오서신권황안송류홍")
+GIVEN = ["민준","서연","도윤","지우","하준","서윤","시우","하은","주원","지민","예준","수아","지호","지유","건우","채원"]
+SCHOOLS = ["대구중","경북중","달서중","수성중","동촌중","성서중","칠곡중"]
+DISTRICTS = ["중구","동구","서구","남구","북구","수성구","달서구","달성군"]
+OUT_REASONS = ["병원 진료","가족 행사","주말 귀가","학원","개인 용무"]
+SCORE_REASONS = {"상점": ["봉사활동","청소 우수","선행"], "벌점": ["지각","무단 외출","소등 위반","청소 불량"]}
+
+# ================== 데이터 생성 ==================
+def _dates(rng, n, start, days):
+    return pd.Timestamp(start) + pd.to_timedelta(rng.integers(0, days, n), unit="D")
+
+def _phones(rng, n):
+    return [f"010-{a:04d}-{b:04d}" for a, b in zip(rng.integers(0, 10000, n), rng.integers(0, 10000, n))]
+
+def generate(students=1000, outings=20000, scores=100000, payments=10000, seed=0, year=YEAR):
+    # 한 학년도(3월~) 분량의 가짜 데이터 → (students, outings, scores, payments) 스키마 타입 프레임
+    rng = np.random.default_rng(seed)
+    ids = np.arange(1, students + 1)
+    grade, cls, num = 1 + (ids - 1) // 300, 1 + (ids - 1) // 30 % 10, 1 + (ids - 1) % 30
+    stu = pd.DataFrame({
+        "ID": ids,
+        "Name": [SURNAMES[a] + GIVEN[b] for a, b in zip(rng.integers(0, len(SURNAMES), students), rng.integers(0, len(GIVEN), students))],
+        "StudentNo": [f"{g}{c:02d}{n:02d}" for g, c, n in zip(grade, cls, num)],   # 학년+반+번호
+        "Gender": rng.choice(["남","여"], students),
+        "Room": [f"{f}{r:02d}" for f, r in zip(rng.integers(2, 6, students), rng.integers(1, 21, students))],
+        "Phone": _phones(rng, students),
+        "ParentPhone": _phones(rng, students),
+        "Address": [f"대구광역시 {d} {n}길 {h}" for d, n, h in zip(rng.choice(DISTRICTS, students), rng.integers(1, 80, students), rng.integers(1, 300, students))],
+        "MiddleSchool": rng.choice(SCHOOLS, students),
+        "InDate": f"{year}-03-02",
+        "OutDate": np.where(rng.random(students) < 0.03, f"{year}-07-20", ""),
+        "Password": PASSWORD,
+        "Note": np.where(rng.random(students) < 0.1, "알레르기", ""),
+    })
+    start = _dates(rng, outings, f"{year}-03-02", 300)
+    out = pd.DataFrame({
+        "ID": np.arange(1, outings + 1),
+        "StudentID": rng.integers(1, students + 1, outings),
+        "Type": rng.choice(["외출","외박"], outings, p=[0.6, 0.4]),
+        "Reason": rng.choice(OUT_REASONS, outings),
+        "StartDate": start,
+        "EndDate": start + pd.to_timedelta(rng.integers(0, 3, outings), unit="D"),
+        "Status": rng.choice(["신청","대기","승인","반려","취소"], outings, p=[0.05, 0.02, 0.8, 0.08, 0.05]),
+    })
+    cat = rng.choice(["상점","벌점"], scores, p=[0.55, 0.45])
+    pts = rng.integers(1, 6, scores)
+    sco = pd.DataFrame({
+        "ID": np.arange(1, scores + 1),
+        "StudentID": rng.integers(1, students + 1, scores),
+        "Category": cat,
+        "Points": np.where(cat == "상점", pts, -pts),
+        "Reason": [SCORE_REASONS[c][i % len(SCORE_REASONS[c])] for c, i in zip(cat, rng.integers(0, 12, scores))],
+        "Date": _dates(rng, scores, f"{year}-03-02", 300),
+    })
+    month = rng.integers(0, 12, payments)
+    pay = pd.DataFrame({
+        "ID": np.arange(1, payments + 1),
+        "StudentID": rng.integers(1, students + 1, payments),
+        "Period": [f"{year + (m + 2) // 12}-{(m + 2) % 12 + 1:02d}" for m in month],
+        "Amount": rng.choice([150000, 180000, 200000], payments),
+        "Status": rng.choice(["납부","미납"], payments, p=[0.9, 0.1]),
+        "PayDate": _dates(rng, payments, f"{year}-03-02", 300),
+        "Method": rng.choice(["현금","카드","이체","기타"], payments),
+        "Note": "",
+    })
+    return tuple(typed(name, df) for name, df in zip(TABLES, (stu, out, sco, pay)))
+
+# ================== 측정 ==================
+def timed(fn, repeat, setup=None):
+    # fn 을 repeat 번 실행한 시간(ms) 통계. setup 은 매번 fn 직전에 실행(측정 제외)
+    runs = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        t = time.perf_counter()
+        fn()
+        runs.append((time.perf_counter() - t) * 1000)
+    return {"runs": len(runs), "min_ms": round(min(runs), 3), "median_ms": round(statistics.median(runs), 3),
+            "max_ms": round(max(runs), 3)}
+
+def app_function(name):
+    # app.py 는 import 하면 화면 스크립트가 실행되므로, import 문과 해당 함수 정의만 꺼내 실행
+    tree = ast.parse(APP.read_text(encoding="utf-8"))
+    body = [n for n in tree.body if isinstance(n, (ast.Import, ast.ImportFrom))
+            or (isinstance(n, ast.FunctionDef) and n.name == name)]
+    ns = {}
+    exec(compile(ast.Module(body=body, type_ignores=[]), str(APP), "exec"), ns)
+    return ns[name]
+
+def _login(at, role, uid, pw):
+    at.radio[0].set_value(role)
+    at.text_input[0].input(uid)
+    at.text_input[1].input(pw)
+    at.button[0].click().run()
+    if at.exception:
+        raise RuntimeError(at.exception[0].message)
+    return at
+
+def bench_reruns(sample_no, repeat, timeout):
+    from streamlit.testing.v1 import AppTest
+    out = {}
+    for key, (role, uid, pw) in {"admin_screen": ("관리자",) + ADMIN, "student_screen": ("학생", sample_no, PASSWORD)}.items():
+        at = AppTest.from_file(str(APP), default_timeout=timeout).run()
+        t = time.perf_counter()
+        _login(at, role, uid, pw)
+        out[f"{key}_login"] = {"runs": 1, "ms": round((time.perf_counter() - t) * 1000, 3)}
+        out[key] = timed(at.run, repeat)
+        if at.exception:
+            raise RuntimeError(at.exception[0].message)
+    return out
+
+def run(args):
+    random.seed(args.seed)
+    res, scale = {}, {"students": args.students, "outings": args.outings, "scores": args.scores, "payments": args.payments}
+    t = time.perf_counter()
+    tables = generate(**scale, seed=args.seed)
+    res["generate"] = {"runs": 1, "ms": round((time.perf_counter() - t) * 1000, 3)}
+
+    storage.save_all(*tables)   # 첫 저장 (파일 생성)
+    res["save_all"] = timed(lambda: storage.save_all(*tables), args.repeat)
+    # 저장 직후의 load_all 은 파일/DB 를 다시 읽음, 두 번째부터는 캐시 적중
+    res["load_all_cold"] = timed(storage.load_all, args.repeat, setup=lambda: storage.save_all(*tables))
+    res["load_all_cached"] = timed(storage.load_all, args.repeat * 20)
+    res["next_id"] = timed(lambda: storage.next_id("Scores"), args.repeat * 20)
+
+    login_student = app_function("login_student")
+    nos = tables[0]["StudentNo"].tolist()
+    res["login_student"] = timed(lambda: login_student(random.choice(nos), PASSWORD), args.repeat * 20)
+
+    students, outings, scores, payments = storage.load_all()
+    for fmt in ("xlsx", "csv"):
+        res[f"make_report_{fmt}"] = timed(lambda: report.make_report(students, outings, scores, payments, fmt=fmt),
+                                          args.repeat, setup=report._cache.clear)
+    res["make_report_month"] = timed(lambda: report.make_report(students, outings, scores, payments, fmt="xlsx",
+                                                                start=f"{YEAR}-09-01", end=f"{YEAR}-09-30"),
+                                     args.repeat, setup=report._cache.clear)
+    if not args.no_apptest:
+        res.update(bench_reruns(nos[0], args.repeat, args.timeout))
+    return {"commit": _commit(), "created": time.strftime("%Y-%m-%dT%H:%M:%S"), "backend": args.backend,
+            "python": platform.python_version(), "pandas": pd.__version__, "platform": platform.platform(),
+            "scale": scale, "repeat": args.repeat, "results": res}
+
+def _commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=APP.parent, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def _ms(r):
+    return r.get("median_ms", r.get("ms"))
+
+def compare(old, new, threshold):
+    # 이전 결과 대비 중앙값 비율. threshold 배 이상 느려진 항목 목록을 돌려줌
+    # 표는 표준 오류로 (--out 없이 돌리면 표준 출력은 결과 JSON 만 남도록)
+    slower = []
+    if (old.get("backend"), old.get("scale")) != (new["backend"], new["scale"]):
+        print(f"주의: 조건이 다릅니다 (이전 {old.get('backend')} {old.get('scale')} / 현재 {new['backend']} {new['scale']})",
+              file=sys.stderr)
+    print(f"{'항목':<24}{'이전(ms)':>12}{'현재(ms)':>12}{'비율':>8}", file=sys.stderr)
+    for name, r in new["results"].items():
+        if name not in old["results"]:
+            continue
+        a, b = _ms(old["results"][name]), _ms(r)
+        ratio = b / a if a else float("inf")
+        print(f"{name:<24}{a:>12.2f}{b:>12.2f}{ratio:>8.2f}" + ("  ← 느려짐" if ratio >= threshold else ""),
+              file=sys.stderr)
+        if ratio >= threshold:
+            slower.append(name)
+    return slower
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="기숙사 관리프로그램 벤치마크 (가짜 데이터, 오프라인)")
+    p.add_argument("--students", type=int, default=1000)
+    p.add_argument("--outings", type=int, default=20000)
+    p.add_argument("--scores", type=int, default=100000)
+    p.add_argument("--payments", type=int, default=10000)
+    p.add_argument("--backend", choices=["sqlite", "excel"], default="sqlite")
+    p.add_argument("--repeat", type=int, default=5)
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--timeout", type=float, default=300, help="AppTest rerun 한 번의 제한 시간(초)")
+    p.add_argument("--no-apptest", action="store_true", help="화면 rerun 측정 생략")
+    p.add_argument("--out", help="결과 JSON 파일 (생략 시 표준 출력)")
+    p.add_argument("--compare", help="비교할 이전 결과 JSON")
+    p.add_argument("--threshold", type=float, default=1.5, help="이 배수 이상 느려지면 종료 코드 1")
+    args = p.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+    with tempfile.TemporaryDirectory(prefix="dalgubul-bench-") as tmp:
+        # 실제 데이터 파일은 건드리지 않도록 임시 폴더에서
+        storage.STORAGE_BACKEND = args.backend
+        storage.DATA_FILE = Path(tmp, "data.xlsx")
+        storage.DB_FILE = Path(tmp, "data.db")
+        storage.ARCHIVE_DIR = Path(tmp, "archive")
+        cwd = os.getcwd()
+        os.chdir(tmp)
+        try:
+            result = run(args)
+        finally:
+            os.chdir(cwd)
+    text = json.dumps(result, ensure_ascii=False, indent=1)
+    if args.out:
+        Path(args.out).write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
+    if args.compare:
+        old = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        return 1 if compare(old, result, args.threshold) else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
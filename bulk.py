@@ -0,0 +1,109 @@
+import datetime
+import io
+
+import pandas as pd
+
+from indexes import credential_index
+
+# ================== 일괄 등록 ==================
+# CSV/XLSX 파일의 행 전체를 pandas 로 한 번에 검사하고, 통과한 행은 storage.bulk_insert 로 한 번에 커밋한다.
+# 학생 기록(상벌점/납부)은 학번으로 학생을 찾는다. 헤더는 화면의 한글 이름이나 저장 컬럼 이름 모두 가능.
+IMPORTS = {
+    "Students": {
+        "headers": {"이름":"Name","학번":"StudentNo","성별":"Gender","호실":"Room","학생연락처":"Phone",
+                    "보호자연락처":"ParentPhone","주소":"Address","출신중학교":"MiddleSchool","입사일":"InDate",
+                    "퇴사일":"OutDate","비밀번호":"Password","특이사항":"Note"},
+        "required": ["Name","StudentNo","Gender","Password"],
+        "dates": {"InDate": True, "OutDate": False},   # 날짜 컬럼 -> 비어 있으면 오늘 날짜
+        "choices": {"Gender": ["남","여"]},
+        "ints": {},
+    },
+    "Scores": {
+        "headers": {"학번":"StudentNo","구분":"Category","점수":"Points","사유_비고":"Reason","일자":"Date"},
+        "required": ["StudentNo","Category","Points"],
+        "dates": {"Date": True},
+        "choices": {"Category": ["상점","벌점"]},
+        "ints": {"Points": None},   # 정수 컬럼 -> 최솟값
+    },
+    "Payments": {
+        "headers": {"학번":"StudentNo","납부_회차_기간":"Period","금액":"Amount","상태":"Status","납부일":"PayDate",
+                    "방법":"Method","비고":"Note"},
+        "required": ["StudentNo","Period","Amount","Status"],
+        "dates": {"PayDate": True},
+        "choices": {"Status": ["납부","미납"], "Method": ["현금","카드","이체","기타"]},
+        "ints": {"Amount": 0},
+    },
+}
+ERROR_COLS = ["행","오류"]
+_DATE_RE = r"^\d{4}-\d{2}-\d{2}(?: 00:00:00)?$"   # 엑셀 날짜 셀은 문자열로 읽으면 시각이 붙음
+
+def template(table):
+    # 빈 양식 (CSV, 엑셀에서 열리도록 utf-8-sig)
+    return pd.DataFrame(columns=list(IMPORTS[table]["headers"])).to_csv(index=False).encode("utf-8-sig")
+
+def read_upload(file):
+    # 업로드 파일 → 모든 값이 문자열인 DataFrame (학번/연락처 앞자리 0 보존)
+    name = getattr(file, "name", "").lower()
+    data = file.getvalue() if hasattr(file, "getvalue") else file.read()
+    if name.endswith((".xlsx", ".xls")):
+        df = pd.read_excel(io.BytesIO(data), dtype=str)
+    else:
+        try:
+            df = pd.read_csv(io.BytesIO(data), dtype=str, encoding="utf-8-sig")
+        except UnicodeDecodeError:
+            df = pd.read_csv(io.BytesIO(data), dtype=str, encoding="cp949")   # 한글 엑셀에서 저장한 CSV
+    df.columns = [str(c).strip() for c in df.columns]
+    return df.fillna("").apply(lambda s: s.str.strip())
+
+def _student_no(s):
+    return s.str.replace(r"\.0$", "", regex=True)   # 엑셀이 숫자로 저장한 학번 10101.0
+
+def validate(table, raw, students, today=None):
+    # → (등록할 행 dict 목록, 오류 DataFrame[행, 오류]). 행 번호는 헤더를 1행으로 센 파일 기준
+    spec = IMPORTS[table]
+    today = (today or datetime.date.today()).isoformat()
+    df = raw.rename(columns=spec["headers"])
+    names = {v: k for k, v in spec["headers"].items()}   # 오류 메시지는 한글 헤더로
+    missing = [c for c in spec["required"] if c not in df.columns]
+    if missing:
+        raise ValueError(f"필수 열이 없습니다: {', '.join(names[c] for c in missing)}")
+    cols = list(dict.fromkeys(spec["headers"].values()))
+    df = df.reindex(columns=cols, fill_value="").astype(str)
+    problems = []   # (행 마스크, 오류 메시지)
+
+    for col in spec["required"]:
+        problems.append((df[col] == "", f"{names[col]} 값이 비어 있습니다"))
+    for col, allowed in spec["choices"].items():
+        problems.append(((df[col] != "") & ~df[col].isin(allowed), f"{names[col]} 값은 {'/'.join(allowed)} 중 하나여야 합니다"))
+    for col, default in spec["dates"].items():
+        text = df[col]
+        ok = text.str.match(_DATE_RE) & pd.to_datetime(text.str[:10], format="%Y-%m-%d", errors="coerce").notna()
+        problems.append(((text != "") & ~ok, f"{names[col]} 날짜 형식이 잘못되었습니다 (YYYY-MM-DD)"))
+        df[col] = text.str[:10].where(text != "", today if default else "")
+    for col, low in spec["ints"].items():
+        num = pd.to_numeric(df[col], errors="coerce")
+        bad = (df[col] != "") & (num.isna() | (num % 1 != 0) | ((num < low) if low is not None else False))
+        problems.append((bad, f"{names[col]} 값은 {'' if low is None else f'{low} 이상의 '}정수여야 합니다"))
+        df[col] = num.fillna(0).astype("int64")
+
+    df["StudentNo"] = _student_no(df["StudentNo"])
+    index = credential_index(students)
+    if table == "Students":
+        problems.append(((df["StudentNo"] != "") & df["StudentNo"].duplicated(keep=False), "파일 안에서 학번이 중복됩니다"))
+        problems.append((df["StudentNo"].isin(index.keys()), "이미 존재하는 학번입니다"))
+    else:
+        hit = df["StudentNo"].map(index)
+        problems.append(((df["StudentNo"] != "") & ~df["StudentNo"].isin(index.keys()), "없는 학번입니다"))
+        problems.append((df["StudentNo"].isin([k for k, v in index.items() if v is None]), "중복 등록된 학번이라 학생을 특정할 수 없습니다"))
+        df["StudentID"] = hit.map(lambda v: v[0] if isinstance(v, tuple) else 0)
+        df = df.drop(columns="StudentNo")
+    if table == "Scores":
+        df["Points"] = df["Points"].where(df["Category"] == "상점", -df["Points"].abs())   # 등록 폼과 같은 규칙
+    if table == "Payments":
+        df["Method"] = df["Method"].where(df["Method"] != "", "현금")
+
+    errors = pd.concat([pd.DataFrame({"행": df.index[m] + 2, "오류": msg}) for m, msg in problems if m.any()]
+                       or [pd.DataFrame(columns=ERROR_COLS)], ignore_index=True)
+    errors = errors.sort_values("행", kind="stable").reset_index(drop=True)
+    good = df[~df.index.isin(errors["행"] - 2)]
+    return good.to_dict("records"), errors
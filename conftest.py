@@ -0,0 +1,14 @@
+import pytest
+
+import storage
+
+@pytest.fixture
+def use(monkeypatch, tmp_path):
+    # storage 의 모듈 전역 백엔드를 테스트용 백엔드로 바꿈 (보관 폴더도 임시 폴더로)
+    def use(b):
+        monkeypatch.setattr(storage, "_backend", b)
+        monkeypatch.setattr(storage, "ARCHIVE_DIR", tmp_path / "archive")
+        storage.invalidate()
+        return b
+    yield use
+    storage.invalidate()
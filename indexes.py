@@ -0,0 +1,308 @@
+import threading
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+import storage
+from storage import TABLES, date_text, stored
+from timing import span
+
+# ================== 파생 인덱스 ==================
+# load_all() 이 돌려주는 DataFrame 은 데이터 버전마다 새 객체이고 모든 세션이 공유하므로,
+# 원본 프레임 객체(is)를 키로 한 번만 만들고 다음 버전이 올 때까지 재사용한다.
+_lock = threading.Lock()
+_memo = {}   # 이름 -> (원본 프레임, 값)
+
+def memo(frame, name, build):
+    with _lock:
+        hit = _memo.get(name)
+        if hit is not None and hit[0] is frame:
+            return hit[1]
+    value = build()
+    with _lock:
+        _memo[name] = (frame, value)
+    return value
+
+# ---- StudentID → 이름 ----
+def name_index(students):
+    return memo(students, "names", lambda: dict(zip(students["ID"].tolist(), students["Name"].tolist())))
+
+def name_by_sid(students, sid):
+    return name_index(students).get(sid, "")
+
+def with_names(df, students, col="이름"):
+    # StudentID 를 해시 조회로 이름에 붙인 사본 (행마다 Students 전체를 훑지 않음)
+    with span("with_names", rows=len(df)):
+        out = df.copy()
+        out[col] = out["StudentID"].map(name_index(students)).fillna("") if len(out) else ""
+        return out
+
+# ---- 학번 → (ID, 비밀번호) ----
+def _text(v):
+    # 엑셀이 숫자로 읽은 학번/비밀번호(10101, 10101.0)도 문자열 '10101' 로 맞춤
+    if isinstance(v, float) and v.is_integer():
+        v = int(v)
+    return str(v)
+
+def _build_credentials(students):
+    index = {}
+    for sid, no, pw in zip(students["ID"].tolist(), students["StudentNo"].tolist(), students["Password"].tolist()):
+        key = _text(no)
+        index[key] = None if key in index else (int(sid), _text(pw))   # 중복 학번은 로그인 불가
+    return index
+
+def credential_index(students):
+    # Students 가 바뀔 때만 다시 만든다 (다른 테이블만 바뀐 버전은 같은 프레임 객체를 재사용)
+    return memo(students, "credentials", lambda: _build_credentials(students))
+
+def student_no_exists(students, student_no):
+    return _text(student_no) in credential_index(students)
+
+# ---- 학생별 행 위치 (StudentID → 행 번호 배열) ----
+def student_rows(df, table, sid):
+    # 학생 한 명의 기록 (전체 프레임을 매번 마스킹하지 않음)
+    pos = memo(df, f"rows:{table}", lambda: df.groupby("StudentID").indices if len(df) else {}).get(sid)
+    return df.iloc[pos] if pos is not None else df.iloc[0:0]
+
+# ---- 목록 검색/정렬 (행 번호 배열 기반) ----
+def value_rows(df, table, col):
+    # 컬럼 값 -> 행 번호 배열 (상태/구분 필터용)
+    return memo(df, f"values:{table}:{col}", lambda: df.groupby(col, observed=True).indices if len(df) else {})
+
+def date_keys(df, table, col):
+    # 날짜 컬럼을 'YYYY-MM-DD' 문자열 배열로 (빈 날짜는 "" 라서 가장 앞에 정렬됨)
+    return memo(df, f"dates:{table}:{col}", lambda: date_text(df[col]).to_numpy())
+
+def sorted_rows(df, table, col, date=False):
+    # (정렬된 행 번호, 정렬된 키). 날짜 컬럼은 'YYYY-MM-DD' 문자열로 비교
+    def build():
+        s = df[col]
+        if date:
+            keys = date_keys(df, table, col)
+        elif pd.api.types.is_numeric_dtype(s):
+            keys = s.to_numpy(dtype="float64", na_value=np.nan)   # Int64 의 빈 값은 NaN (맨 뒤)
+        else:
+            keys = s.astype(str).to_numpy()
+        order = np.argsort(keys, kind="stable")
+        return order, keys[order]
+    return memo(df, f"order:{table}:{col}:{date}", build)
+
+def student_search(students, text):
+    # 이름/학번/호실에 text 가 들어간 학생 ID 배열
+    hay = memo(students, "search", lambda: (students["Name"] + "\t" + students["StudentNo"] + "\t" + students["Room"]).str.lower())
+    return students["ID"].to_numpy()[hay.str.contains(text.strip().lower(), regex=False).to_numpy()]
+
+def _intersect(a, b):
+    return b if a is None else np.intersect1d(a, b, assume_unique=True)
+
+def filter_rows(df, table, students, text="", col=None, values=(), dates=None, start=None, end=None):
+    # 조건에 맞는 행 번호 배열 (None = 전체). dates=(시작 컬럼, 종료 컬럼 또는 None) — 종료 컬럼이 있으면 기간이 겹치는 행
+    pos = None
+    if text.strip():
+        ids = student_search(students, text)
+        if table == "Students":
+            pos = np.flatnonzero(students["ID"].isin(ids).to_numpy())
+        else:
+            by_sid = memo(df, f"rows:{table}", lambda: df.groupby("StudentID").indices if len(df) else {})
+            parts = [by_sid[i] for i in ids if i in by_sid]
+            pos = np.sort(np.concatenate(parts)) if parts else np.array([], dtype=np.intp)
+    if col and values:
+        by_val = value_rows(df, table, col)
+        parts = [by_val[v] for v in values if v in by_val]
+        pos = _intersect(pos, np.sort(np.concatenate(parts)) if parts else np.array([], dtype=np.intp))
+    if dates and (start or end):
+        first, last = dates
+        order, keys = sorted_rows(df, table, first, date=True)
+        lo = np.searchsorted(keys, start, "left") if (start and not last) else 0
+        hi = np.searchsorted(keys, end, "right") if end else len(keys)
+        cand = order[lo:hi]
+        if last and start:   # 기간 겹침: 시작일 <= end 이고 종료일 >= start
+            ends = date_keys(df, table, last)[cand]
+            cand = cand[ends >= start]
+        pos = _intersect(pos, np.sort(cand))
+    return pos
+
+def order_rows(df, table, pos, col, desc=False, date=False):
+    # pos(또는 전체)를 col 기준으로 정렬한 행 번호 배열
+    order, _ = sorted_rows(df, table, col, date)
+    if pos is not None:
+        order = order[np.isin(order, pos)]
+    return order[::-1] if desc else order
+
+# ---- 외출·외박 기간 (점호) ----
+# 대상 상태의 기간을 시작일 순으로 정렬하고 종료일의 누적 최대값을 함께 두면, 날짜 구간 [a, b] 와 겹치는 행은
+# (누적 최대 종료일 >= a 인 첫 위치) ~ (시작일 <= b 인 마지막 위치) 사이에만 있으므로 이분 탐색 두 번으로 좁혀진다.
+def _days(s):
+    return pd.to_datetime(s, errors="coerce").to_numpy().astype("datetime64[D]")
+
+def outing_intervals(outings, statuses=("승인",)):
+    # (시작일 순 행 번호, 시작일, 종료일, 누적 최대 종료일). 날짜가 잘못된 행은 제외
+    def build():
+        by = value_rows(outings, "Outings", "Status")
+        parts = [by[s] for s in statuses if s in by]
+        pos = np.sort(np.concatenate(parts)) if parts else np.array([], dtype=np.intp)
+        start, end = _days(outings["StartDate"].iloc[pos]), _days(outings["EndDate"].iloc[pos])
+        ok = ~(np.isnat(start) | np.isnat(end))
+        pos, start, end = pos[ok], start[ok], np.maximum(start[ok], end[ok])   # 종료일 < 시작일이면 하루짜리로
+        order = np.argsort(start, kind="stable")
+        end = end[order]
+        return pos[order], start[order], end, np.maximum.accumulate(end) if len(end) else end
+    return memo(outings, f"intervals:{','.join(statuses)}", build)
+
+def away_rows(outings, start, end=None, statuses=("승인",)):
+    # 기간이 [start, end] (end 생략 시 start 하루) 와 겹치는 외출·외박의 행 번호
+    pos, s, e, reach = outing_intervals(outings, tuple(statuses))
+    a, b = np.datetime64(start, "D"), np.datetime64(end or start, "D")
+    lo, hi = np.searchsorted(reach, a, "left"), np.searchsorted(s, b, "right")
+    return np.sort(pos[lo:hi][e[lo:hi] >= a]) if hi > lo else np.array([], dtype=np.intp)
+
+def overlapping_outings(outings, sid, start, end, statuses=("신청","대기","승인")):
+    # 학생 sid 의 기존 외출·외박 중 [start, end] 와 기간이 겹치는 행 (등록 전 중복 확인용)
+    mine = student_rows(outings, "Outings", sid)
+    mine = mine[mine["Status"].isin(statuses)]
+    s, e = date_text(mine["StartDate"]), date_text(mine["EndDate"])
+    return mine[(s <= str(end)[:10]) & (e >= str(start)[:10])]
+
+# ---- 메모리 사용량 ----
+def memory_usage(tables):
+    # 테이블 -> (행 수, 현재 타입의 메모리, 전부 object 였을 때의 메모리) 바이트 (데이터 버전마다 한 번 계산)
+    def build(name, df):
+        return (len(df), int(df.memory_usage(deep=True).sum()),
+                int(stored(name, df).astype(object).memory_usage(deep=True).sum()))
+    return {name: memo(df, f"memory:{name}", lambda: build(name, df)) for name, df in zip(TABLES, tables)}
+
+# ---- 학생별 상벌점/납부 집계 ----
+# 쓰기 큐가 커밋한 연산으로 증분 갱신하고(storage.commit_hooks), 그 밖의 경로(save_all, 외부 수정)로
+# 데이터가 바뀌어 묶여 있던 프레임과 달라지면 전체를 다시 계산한다.
+STATS_COLS = ["StudentID","PosPoints","NegPoints","NetPoints","ScoreCount","LastScoreDate",
+              "PayCount","PaidAmount","UnpaidAmount","LastPayDate"]
+
+def _int(v):
+    try:
+        return int(float(v))
+    except (TypeError, ValueError):
+        return 0
+
+def _day(v):
+    return "" if v is None or v is pd.NaT or v is pd.NA or v == "" else str(v)[:10]
+
+def _empty():
+    return {"pos": 0, "neg": 0, "n": 0, "dates": Counter(),
+            "pay_n": 0, "paid": 0, "unpaid": 0, "pay_dates": Counter()}
+
+class StudentStats:
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.bound = (None, None)   # 집계가 반영하고 있는 (scores, payments) 프레임
+        self.data = {}
+        self._frame = None
+
+    def _entry(self, sid):
+        e = self.data.get(sid)
+        if e is None:
+            e = self.data[sid] = _empty()
+        return e
+
+    @staticmethod
+    def _count(counter, day, sign):
+        if day:
+            counter[day] += sign
+            if counter[day] <= 0:
+                del counter[day]
+
+    def _score(self, row, sign):
+        e, p = self._entry(_int(row["StudentID"])), _int(row["Points"])
+        if p > 0:
+            e["pos"] += sign * p
+        elif p < 0:
+            e["neg"] += sign * p
+        e["n"] += sign
+        self._count(e["dates"], _day(row["Date"]), sign)
+
+    def _payment(self, row, sign):
+        e, a = self._entry(_int(row["StudentID"])), _int(row["Amount"])
+        e["pay_n"] += sign
+        if row["Status"] == "미납":
+            e["unpaid"] += sign * a
+        elif row["Status"] == "납부":
+            e["paid"] += sign * a
+        self._count(e["pay_dates"], _day(row["PayDate"]), sign)
+
+    def rebuild(self, scores, payments):
+        self.data, self._frame = {}, None
+        for sid, p, d in zip(scores["StudentID"].tolist(), scores["Points"].tolist(), scores["Date"].tolist()):
+            self._score({"StudentID": sid, "Points": p, "Date": d}, 1)
+        cols = ["StudentID", "Amount", "Status", "PayDate"]
+        for vals in zip(*(payments[c].tolist() for c in cols)):
+            self._payment(dict(zip(cols, vals)), 1)
+        self.bound = (scores, payments)
+
+    def on_commit(self, before, ops, after):
+        with self.lock:
+            if self.bound[0] is not before[2] or self.bound[1] is not before[3]:
+                return   # 다른 버전에 묶여 있으면 다음 조회 때 전체 재계산
+            pending = {}   # 이번 배치에서 바뀐 행 (테이블, ID) -> 행 / None(삭제)
+
+            def old_row(table, rid):
+                if (table, rid) in pending:
+                    return pending[(table, rid)]
+                df = before[2] if table == "Scores" else before[3]
+                m = df[df["ID"] == rid]
+                return m.iloc[0].to_dict() if len(m) else None
+
+            for op in ops:
+                if op["op"] == "delete_student":
+                    if op.get("cascade"):
+                        self.data.pop(op["id"], None)
+                    continue
+                table = op["table"]
+                if table not in ("Scores", "Payments"):
+                    continue
+                apply = self._score if table == "Scores" else self._payment
+                if op["op"] in ("insert", "insert_many"):
+                    for new in (op["rows"] if op["op"] == "insert_many" else [op["row"]]):
+                        apply(new, 1)
+                        pending[(table, new["ID"])] = new
+                    continue
+                for rid in (op["ids"] if op["op"] == "update_many" else [op["id"]]):
+                    old = old_row(table, rid)
+                    if old is None:
+                        continue
+                    apply(old, -1)
+                    new = dict(old, **op["values"]) if op["op"] != "delete" else None
+                    if new is not None:
+                        apply(new, 1)
+                    pending[(table, rid)] = new
+            self.bound, self._frame = (after[2], after[3]), None
+
+    def _ensure(self, scores, payments):
+        if self.bound[0] is not scores or self.bound[1] is not payments:
+            self.rebuild(scores, payments)
+
+    def row(self, scores, payments, sid):
+        with self.lock:
+            self._ensure(scores, payments)
+            e = self.data.get(sid) or _empty()
+            return {"pos": e["pos"], "neg": e["neg"], "net": e["pos"] + e["neg"], "count": e["n"],
+                    "last_date": max(e["dates"], default=""), "pay_count": e["pay_n"],
+                    "paid": e["paid"], "unpaid": e["unpaid"], "last_pay_date": max(e["pay_dates"], default="")}
+
+    def frame(self, scores, payments):
+        with self.lock:
+            self._ensure(scores, payments)
+            if self._frame is None:
+                self._frame = pd.DataFrame(
+                    [[sid, e["pos"], e["neg"], e["pos"] + e["neg"], e["n"], max(e["dates"], default=""),
+                      e["pay_n"], e["paid"], e["unpaid"], max(e["pay_dates"], default="")]
+                     for sid, e in self.data.items()], columns=STATS_COLS)
+            return self._frame
+
+_stats = StudentStats()
+storage.commit_hooks.append(_stats.on_commit)
+
+def student_stats(scores, payments, sid=None):
+    # sid 지정 시 그 학생의 집계 dict, 아니면 학생별 집계 DataFrame (STATS_COLS)
+    if sid is not None:
+        return _stats.row(scores, payments, sid)
+    return _stats.frame(scores, payments)
@@ -0,0 +1,179 @@
+import csv
+import importlib.util
+import io
+import tempfile
+import threading
+import zipfile
+from collections import OrderedDict
+
+import pandas as pd
+from openpyxl import Workbook
+
+from indexes import name_index, with_names, student_stats
+from storage import stored
+from timing import span
+
+# ================== 보고서 ==================
+# 보고서는 다운로드 요청이 있을 때만 만들고, (데이터 버전, 형식, 필터) 별로 최근 몇 개를 캐시한다.
+# 데이터 버전은 load_all() 이 돌려준 원본 프레임 객체로 구분한다.
+XLSX_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+REPORT_FORMATS = {   # 형식 -> (파일 이름, mime)
+    "xlsx": ("report.xlsx", XLSX_MIME),
+    "csv": ("report_csv.zip", "application/zip"),
+    "parquet": ("report_parquet.zip", "application/zip"),
+}
+REPORT_CACHE_SIZE = 8
+
+_lock = threading.Lock()
+_cache = OrderedDict()   # 키 -> (원본 프레임들, bytes)
+
+def parquet_available():
+    return any(importlib.util.find_spec(m) for m in ("pyarrow", "fastparquet"))
+
+# 시트 -> (테이블, [(원본 컬럼, 머리글)]). "이름" 은 StudentID 로 찾은 학생 이름
+SHEETS = {
+    "학생": ("Students", [("Name","이름"),("StudentNo","학번"),("Gender","성별"),("Room","호실"),("Phone","학생연락처"),
+                         ("ParentPhone","보호자연락처"),("Address","주소"),("MiddleSchool","출신중학교"),("InDate","입사일"),
+                         ("OutDate","퇴사일"),("Note","특이사항")]),
+    "외출_외박": ("Outings", [("이름","이름"),("Type","구분"),("Reason","사유"),("StartDate","시작일"),("EndDate","종료일"),
+                            ("Status","상태")]),
+    "상벌점": ("Scores", [("이름","이름"),("Category","구분"),("Points","점수"),("Reason","사유_비고"),("Date","일자")]),
+    "납부": ("Payments", [("이름","이름"),("Period","납부_회차_기간"),("Amount","금액"),("Status","상태"),("PayDate","납부일"),
+                        ("Method","방법"),("Note","비고")]),
+}
+REPORT_CHUNK_ROWS = 5000   # 원본 프레임에서 이만큼씩 꺼내 필요한 컬럼만 형식을 바꿔 쓴다
+
+def _dates(s):
+    return s if pd.api.types.is_datetime64_any_dtype(s) else pd.to_datetime(s, errors="coerce", format="ISO8601")
+
+def _mask(df, student_ids, col=None, start=None, end=None, end_col=None):
+    # 보고서에 넣을 행 (bool Series). 날짜를 글자로 바꾸지 않고 비교 (빈 날짜는 시작 조건에서만 빠짐)
+    m = pd.Series(True, index=df.index)
+    if student_ids is not None:
+        m &= df["StudentID"].isin(student_ids)
+    if col and start:
+        m &= _dates(df[end_col or col]) >= pd.Timestamp(start)
+    if col and end:
+        m &= ~(_dates(df[col]) > pd.Timestamp(end))
+    return m
+
+def _parts(df, mask, cols):
+    # 원본 프레임을 REPORT_CHUNK_ROWS 행씩 잘라 mask 에 드는 행의 cols 만 (전체 사본을 만들지 않음)
+    idx, m = df.columns.get_indexer(cols), mask.to_numpy()
+    for i in range(0, len(df), REPORT_CHUNK_ROWS):
+        part = df.iloc[i:i + REPORT_CHUNK_ROWS].iloc[:, idx][m[i:i + REPORT_CHUNK_ROWS]]   # 행을 먼저 잘라야 컬럼 전체를 복사하지 않음
+        if len(part):
+            yield part
+
+def _chunks(table, df, mask, cols, names):
+    # 보고서 행 조각: 필요한 컬럼만 골라 날짜는 'YYYY-MM-DD' 로, 이름을 붙이고 머리글은 한글로
+    src = [c for c, _ in cols if c != "이름"] + (["StudentID"] if any(c == "이름" for c, _ in cols) else [])
+    for part in _parts(df, mask, src):
+        part = stored(table, part)
+        if "StudentID" in src:
+            part["이름"] = part["StudentID"].map(names).fillna("")
+        yield part[[c for c, _ in cols]].set_axis([h for _, h in cols], axis=1)
+
+def _summary(students, scores, payments, mask, start=None, end=None, student_ids=None):
+    # 상벌점 요약 (기간 지정이 없으면 학생별 집계 테이블에서 바로)
+    if not mask.any():
+        return pd.DataFrame(columns=["이름","총 상점","총 벌점","순점수"])
+    if not (start or end):
+        agg = student_stats(scores, payments)
+        agg = agg[agg["ScoreCount"] > 0]
+        if student_ids is not None:
+            agg = agg[agg["StudentID"].isin(student_ids)]
+        summary = with_names(agg, students).rename(columns={"PosPoints":"총 상점","NegPoints":"총 벌점","NetPoints":"순점수"})
+        return summary[["이름","총 상점","총 벌점","순점수"]].sort_values("이름").reset_index(drop=True)
+    # 기간 지정: 조각마다 학생별로 합친 뒤 이름별로 (기간 안의 행 전체를 따로 모으지 않음)
+    agg = None
+    for part in _parts(scores, mask, ["StudentID", "Points"]):
+        pts, sid = part["Points"], part["StudentID"]
+        s = pd.concat([pts[pts>0].groupby(sid[pts>0]).sum().rename("총 상점"),
+                       pts[pts<0].groupby(sid[pts<0]).sum().rename("총 벌점"),
+                       pts.groupby(sid).sum().rename("순점수")], axis=1)
+        agg = s if agg is None else agg.add(s, fill_value=0)
+    names = agg.index.map(name_index(students)).fillna("")
+    return agg.groupby(pd.Index(names, name="이름")).sum().fillna(0).reset_index()
+
+def report_sheets(students, outings, scores, payments, start=None, end=None, student_ids=None):
+    # 시트 이름 -> (행 수, DataFrame 조각 iterator). start/end 는 'YYYY-MM-DD', 외출·외박은 기간이 겹치는 것을 포함
+    if student_ids is not None:
+        student_ids = list(student_ids)
+    frames = {"Students": students, "Outings": outings, "Scores": scores, "Payments": payments}
+    masks = {
+        "Students": students["ID"].isin(student_ids) if student_ids is not None else pd.Series(True, index=students.index),
+        "Outings": _mask(outings, student_ids, "StartDate", start, end, end_col="EndDate"),
+        "Scores": _mask(scores, student_ids, "Date", start, end),
+        "Payments": _mask(payments, student_ids, "PayDate", start, end),
+    }
+    names = name_index(students)
+    out = {sheet: (int(masks[table].sum()), _chunks(table, frames[table], masks[table], cols, names))
+           for sheet, (table, cols) in SHEETS.items()}
+    summary = _summary(students, scores, payments, masks["Scores"], start, end, student_ids)
+    out["상벌점_요약"] = (len(summary), iter([summary]))
+    return out
+
+def _cell(v):
+    if v is None or pd.isna(v):   # NaN, Int64 의 빈 값(pd.NA), NaT
+        return None
+    return v.item() if hasattr(v, "item") else v
+
+def _header(name):
+    return [h for _, h in SHEETS[name][1]] if name in SHEETS else ["이름","총 상점","총 벌점","순점수"]
+
+def _write_xlsx(sheets, f):
+    # write-only 통합문서: 행을 바로 임시 파일로 흘려보내 시트 크기와 무관하게 메모리 사용이 일정
+    wb = Workbook(write_only=True)
+    for name, (_, chunks) in sheets.items():
+        ws = wb.create_sheet(name)
+        ws.append(_header(name))
+        for part in chunks:
+            for row in part.itertuples(index=False, name=None):
+                ws.append([_cell(v) for v in row])
+    wb.save(f)
+
+def _write_zip(sheets, fmt, f):
+    with zipfile.ZipFile(f, "w", zipfile.ZIP_DEFLATED) as z:
+        for name, (_, chunks) in sheets.items():
+            if fmt == "csv":
+                with z.open(f"{name}.csv", "w") as out:
+                    text = io.TextIOWrapper(out, encoding="utf-8-sig", newline="")   # 엑셀에서 한글 깨짐 방지
+                    w = csv.writer(text)
+                    w.writerow(_header(name))
+                    for part in chunks:
+                        w.writerows(part.itertuples(index=False, name=None))
+                    text.flush()
+                    text.detach()
+            else:
+                # parquet 은 시트 하나씩 모아서 씀 (한 번에 한 시트 분량만 메모리에)
+                parts = list(chunks)
+                df = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=_header(name))
+                z.writestr(f"{name}.parquet", df.astype({c: str for c in df.columns if df[c].dtype == object})
+                           .to_parquet(index=False))
+
+def make_report(students, outings, scores, payments, fmt="xlsx", start=None, end=None, student_ids=None):
+    if fmt not in REPORT_FORMATS:
+        raise ValueError(f"지원하지 않는 보고서 형식: {fmt}")
+    frames = (students, outings, scores, payments)
+    key = (tuple(map(id, frames)), fmt, start, end, tuple(sorted(student_ids)) if student_ids is not None else None)
+    with _lock:
+        hit = _cache.get(key)
+        if hit is not None and all(a is b for a, b in zip(hit[0], frames)):
+            _cache.move_to_end(key)
+            return hit[1]
+    with span("make_report", fmt=fmt) as f, tempfile.TemporaryFile() as out:
+        # 파일은 임시 파일에 쓰고 다 쓴 뒤 한 번만 읽음 (BytesIO 버퍼와 그 사본을 함께 들고 있지 않도록)
+        sheets = report_sheets(*frames, start=start, end=end, student_ids=student_ids)
+        f["sheets"] = {name: n for name, (n, _) in sheets.items()}
+        if fmt == "xlsx":
+            _write_xlsx(sheets, out)
+        else:
+            _write_zip(sheets, fmt, out)
+        out.seek(0)
+        data = out.read()
+    with _lock:
+        _cache[key] = (frames, data)
+        while len(_cache) > REPORT_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return data
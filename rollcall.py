@@ -0,0 +1,28 @@
+import pandas as pd
+
+from indexes import away_rows
+
+# ================== 점호 ==================
+# 승인된 외출·외박의 기간 인덱스(indexes.away_rows)로 날짜별 부재 학생과 호실별 재실 인원을 구한다.
+NO_ROOM = "(미배정)"
+
+def residents_on(students, start, end=None):
+    # [start, end] 에 입사해 있는 학생 (입사일 <= end, 퇴사일이 비었거나 >= start). 입사일이 빈 학생은 재사생으로 봄
+    start = pd.Timestamp(start)
+    end = pd.Timestamp(end) if end is not None else start
+    m = ~(students["InDate"] > end) & ~(students["OutDate"] < start)
+    return students[m]
+
+def away_on(outings, start, end=None, night=True):
+    # [start, end] 에 나가 있는 승인된 외출·외박 행. night=True 면 외박만 (야간 점호)
+    rows = outings.iloc[away_rows(outings, start, end)]
+    return rows[rows["Type"] == "외박"] if night else rows
+
+def room_occupancy(students, away_ids):
+    # 호실별 인원/부재/재실 (away_ids: 부재 학생 ID)
+    rooms = students["Room"].astype(str).str.strip().replace("", NO_ROOM)
+    total = rooms.value_counts()
+    out = rooms[students["ID"].isin(away_ids)].value_counts()
+    df = pd.DataFrame({"인원": total, "부재": out}).fillna(0).astype(int)
+    df["재실"] = df["인원"] - df["부재"]
+    return df.rename_axis("호실").sort_index().reset_index()
@@ -0,0 +1,484 @@
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+
+import pandas as pd
+
+import storage
+from storage import TABLES, SqliteBackend, _from_json, _py, apply_ops, check_op, max_id, typed
+
+log = logging.getLogger(__name__)
+
+# ================== 구글 시트 백엔드 ==================
+# 여러 PC가 구글 시트 하나를 공유한다. 화면의 읽기/쓰기는 PC마다 있는 로컬 SQLite 캐시에서 바로 처리하고,
+# 쓰기 연산은 옆의 보내기 대기열(<캐시>.outbox, JSON lines)에 fsync 로 남긴다. 백그라운드 동기화 스레드는
+#   1) Meta!A1 의 변경 토큰만 읽어 보고, 다른 PC가 바꿨을 때만 네 시트를 values_batch_get 한 번으로 받고
+#   2) 받은 원격 상태 위에 대기 중인 연산을 다시 적용한 뒤 (다른 PC가 먼저 쓴 ID와 겹치는 insert 는 새 ID로)
+#   3) 원격과 달라진 행만 batch_update(행 삭제/추가) + values_batch_update(값) 두 번의 호출로 보낸다.
+# 실패하면 지수 백오프로 다시 시도하고, 보내지 못한 연산은 대기열에 남아 다음 동기화 때 보낸다.
+# 같은 행을 여러 PC가 동시에 고치면 나중에 보낸 쪽이 남는다 (행 단위 last-writer-wins).
+META = "Meta"
+
+def open_spreadsheet(key, credentials):
+    import gspread   # 선택 의존성: sheets 백엔드를 쓸 때만 필요
+    return gspread.service_account(filename=str(credentials)).open_by_key(key)
+
+def _col(n):
+    return chr(ord("A") + n - 1)   # 1 → A (테이블 컬럼은 26개 이하)
+
+def _cell(v, col):
+    # 시트/연산 값 → 비교용 파이썬 값 (사람이 시트에 직접 넣은 잘못된 숫자는 문자열 그대로)
+    try:
+        return _py(v, col)
+    except (TypeError, ValueError):
+        return str(v)
+
+def _norm(row, cols):
+    return tuple(_cell(row.get(c), c) for c in cols)
+
+def _rows(df, cols):
+    # DataFrame → {ID: 정규화한 행}
+    df = df.reindex(columns=cols)
+    return {_cell(r[0], "ID"): tuple(_cell(v, c) for v, c in zip(r, cols)) for r in df.itertuples(index=False)}
+
+def _values(row):
+    return ["" if v is None else v for v in row]
+
+def _parse(name, values):
+    # 시트 값(머리글 + 행) → (DataFrame, 시트 행 순서의 ID 목록 — ID 없는 행은 None, 머리글 유무)
+    cols = TABLES[name]
+    header = [str(h) for h in values[0]] if values else []
+    if header and header[:len(cols)] != cols:
+        raise ValueError(f"{name} 시트의 머리글이 다릅니다: {header}")
+    order, records = [], []
+    for raw in values[1:]:
+        row = _norm({c: raw[i] for i, c in enumerate(cols) if i < len(raw)}, cols)
+        rid = row[0] if isinstance(row[0], int) else None
+        order.append(rid)
+        if rid is not None:
+            records.append(dict(zip(cols, row)))
+    df = typed(name, pd.DataFrame(records, columns=cols))
+    return df, order, bool(header)
+
+def _replace_ops(old, new):
+    # 전체 교체(save_all)를 행 연산으로: 없어진 행 삭제 + 전체 행 insert_many
+    ops = []
+    for name, a, b in zip(TABLES, old, new):
+        gone = set(a["ID"].tolist()) - set(b["ID"].tolist())
+        ops += [{"op": "delete", "table": name, "id": i} for i in sorted(gone)]
+        if len(b):
+            ops.append({"op": "insert_many", "table": name, "rows": b.to_dict("records")})
+    return ops
+
+def _map_ids(op, remap):
+    # 재배치된 ID(remap: 테이블 -> {옛 ID: 새 ID})를 연산의 ID·StudentID 참조에 반영
+    op, kind = dict(op), op["op"]
+    sid = remap["Students"]
+    if kind == "delete_student":
+        op["id"] = sid.get(op["id"], op["id"])
+    elif kind in ("insert", "insert_many"):
+        m = remap[op["table"]]
+        rows = [dict(r, ID=m.get(r.get("ID"), r.get("ID"))) for r in (op["rows"] if kind == "insert_many" else [op["row"]])]
+        for r in rows:
+            if "StudentID" in r:
+                r["StudentID"] = sid.get(r["StudentID"], r["StudentID"])
+        if kind == "insert_many":
+            op["rows"] = rows
+        else:
+            op["row"] = rows[0]
+    else:
+        m = remap[op["table"]]
+        if kind == "update_many":
+            op["ids"] = [m.get(i, i) for i in op["ids"]]
+        else:
+            op["id"] = m.get(op["id"], op["id"])
+        if "StudentID" in op.get("values", {}):
+            op["values"] = dict(op["values"], StudentID=sid.get(op["values"]["StudentID"], op["values"]["StudentID"]))
+    return op
+
+class SheetsBackend:
+    name = "sheets"
+
+    def __init__(self, spreadsheet, cache_path, migrate_from=None, sync_seconds=None, autostart=True):
+        self.sheet = spreadsheet
+        self.local = SqliteBackend(cache_path, migrate_from=migrate_from)
+        self.path = self.local.path
+        self.outbox = self.path.with_name(self.path.name + ".outbox")
+        self.sync_seconds = sync_seconds or storage.SHEETS_SYNC_SECONDS
+        self.autostart = autostart
+        self._lock = threading.RLock()        # 로컬 캐시 + 대기열
+        self._sync_lock = threading.Lock()    # 동기화는 한 번에 하나
+        self._remote = None    # 마지막으로 맞춘 원격 상태 {"tables", "order", "header", "rows", "token", "ts"}
+        self._sheets = None    # 시트 제목 -> [sheetId, 행 수]
+        self._wake = threading.Event()
+        self._thread = None
+        self._last = 0.0
+        self._status = {"pending": None, "last_sync": None, "last_error": None, "failures": 0, "calls": 0}
+
+    # ---- 로컬 캐시 (화면 요청은 여기서 끝남) ----
+    def version(self):
+        self._start()
+        return self.local.version()
+
+    def read(self):
+        self._start()
+        return self.local.read()
+
+    def reserve(self, table, n=1, floor=0):
+        return self.local.reserve(table, n, floor)
+
+    def apply(self, ops):
+        for op in ops:
+            check_op(op)
+        with self._lock:
+            self.local.apply(ops)
+            self._append(ops)
+        self._wake.set()
+
+    def write(self, tables):
+        with self._lock:
+            old = self.local.read()
+            self.local.write(tables)
+            self._append(_replace_ops(old, tables))
+        self._wake.set()
+
+    def sync_status(self):
+        with self._lock:
+            if self._status["pending"] is None:
+                self._status["pending"] = len(self._pending()[0])
+            return dict(self._status)
+
+    # ---- 보내기 대기열 ----
+    def _append(self, ops):
+        with open(self.outbox, "ab+") as f:
+            if f.tell():
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":   # 직전에 쓰다 만 줄 끊기
+                    f.write(b"\n")
+            for op in ops:
+                f.write((json.dumps(op, ensure_ascii=False, default=_py) + "\n").encode("utf-8"))
+            f.flush()
+            os.fsync(f.fileno())
+        if self._status["pending"] is not None:
+            self._status["pending"] += len(ops)
+
+    def _pending(self, start=0):
+        # start 바이트부터 대기열 읽기 → (ops, 끝 오프셋). 쓰다 만 마지막 줄은 남겨둔다
+        try:
+            with open(self.outbox, "rb") as f:
+                f.seek(start)
+                data = f.read()
+        except FileNotFoundError:
+            return [], start
+        ops, end = [], start
+        for line in data.splitlines(keepends=True):
+            if not line.endswith(b"\n"):
+                break
+            end += len(line)
+            try:
+                ops.append(_from_json(json.loads(line)))
+            except ValueError:
+                log.warning("%s: 손상된 대기열 줄 건너뜀 %r", self.outbox, line[:80])
+        return ops, end
+
+    def _reset_outbox(self, ops):
+        tmp = self.outbox.with_name(self.outbox.name + ".tmp")
+        with open(tmp, "wb") as f:
+            for op in ops:
+                f.write((json.dumps(op, ensure_ascii=False, default=_py) + "\n").encode("utf-8"))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.outbox)
+        self._status["pending"] = len(ops)
+
+    # ---- 원격 시트 ----
+    def _call(self, method, *args, **kwargs):
+        self._status["calls"] += 1
+        return getattr(self.sheet, method)(*args, **kwargs)
+
+    def _get(self, ranges):
+        resp = self._call("values_batch_get", ranges, params={"valueRenderOption": "UNFORMATTED_VALUE"})
+        return [vr.get("values", []) for vr in resp["valueRanges"]]
+
+    def _ensure_sheets(self):
+        if self._sheets is not None:
+            return
+        sheets = {ws.title: [ws.id, ws.row_count] for ws in self._call("worksheets")}
+        for name in list(TABLES) + [META]:
+            if name not in sheets:
+                ws = self._call("add_worksheet", name, rows=100, cols=len(TABLES.get(name, [META])))
+                sheets[name] = [ws.id, ws.row_count]
+        self._sheets = sheets
+
+    def _pull(self):
+        # → (원격 상태, 테이블 -> 지난번과 달라진 ID). 처음이면 달라진 ID 대신 None
+        # 토큰이 그대로면 시트 본문은 읽지 않음 (사람이 시트를 직접 고친 것은 주기적인 전체 확인에서 잡힘)
+        r = self._remote
+        if r is not None and time.time() - r["ts"] < storage.SHEETS_FULL_PULL_SECONDS:
+            meta = self._get([f"{META}!A1"])[0]
+            if (meta[0][0] if meta and meta[0] else "") == r["token"]:
+                return r, dict.fromkeys(TABLES, set())
+        vals = self._get(list(TABLES) + [f"{META}!A1"])
+        tables, order, header, rows = [], {}, {}, {}
+        for (name, cols), v in zip(TABLES.items(), vals):
+            df, order[name], header[name] = _parse(name, v)
+            tables.append(df)
+            rows[name] = _rows(df, cols)
+        meta = vals[-1]
+        new = {"tables": tuple(tables), "order": order, "header": header, "rows": rows,
+               "token": meta[0][0] if meta and meta[0] else "", "ts": time.time()}
+        if r is None:
+            return new, None
+        diff = {}
+        for name in TABLES:
+            a, b = r["rows"][name], rows[name]
+            diff[name] = (a.keys() - b.keys()) | {i for i, row in b.items() if a.get(i) != row}
+        return new, diff
+
+    def _rebase(self, remote, ops):
+        # 다른 PC가 먼저 쓴 ID와 겹치는 insert 는 새 ID로 바꾸고, 뒤따르는 연산의 참조도 같이 바꾼다
+        rows = remote["rows"]
+        remap = {name: {} for name in TABLES}
+        out = []
+        for op in ops:
+            op = _map_ids(op, remap)
+            kind = op["op"]
+            if kind in ("insert", "insert_many"):
+                name, cols = op["table"], TABLES[op["table"]]
+                clash = [r["ID"] for r in (op["rows"] if kind == "insert_many" else [op["row"]])
+                         if r.get("ID") in rows[name] and rows[name][r["ID"]] != _norm(r, cols)]
+                if clash:   # 같은 내용이면 지난번에 보낸 행이므로 그대로 둠
+                    first = self.local.reserve(name, len(clash))
+                    remap[name].update(zip(clash, range(first, first + len(clash))))
+                    op = _map_ids(op, remap)   # 새 ID는 원격 최대값보다 커서 다시 바뀌지 않음
+            out.append(op)
+        return out, remap
+
+    def _push(self, remote, merged):
+        # 원격과 달라진 행만 보냄 → 보낸 뒤의 원격 상태 (보낼 것이 없으면 호출하지 않음)
+        requests, data, order, grids, rows_after = [], [], {}, {}, {}
+        for (name, cols), old, new in zip(TABLES.items(), remote["tables"], merged):
+            sid, grid = self._sheets[name]
+            before, after = _rows(old, cols), _rows(new, cols)
+            rows = remote["order"][name]
+            gone = {i for i, rid in enumerate(rows) if rid is not None and rid not in after}
+            for i in sorted(gone, reverse=True):   # 아래 행부터 지워야 위치가 밀리지 않음
+                requests.append({"deleteDimension": {"range": {"sheetId": sid, "dimension": "ROWS",
+                                                               "startIndex": i + 1, "endIndex": i + 2}}})
+            keep = [rid for i, rid in enumerate(rows) if i not in gone]
+            added = [rid for rid in after if rid not in before]
+            last = _col(len(cols))
+            if not remote["header"][name]:
+                data.append({"range": f"{name}!A1:{last}1", "values": [cols]})
+            for i, rid in enumerate(keep):
+                if rid is not None and after[rid] != before[rid]:
+                    data.append({"range": f"{name}!A{i+2}:{last}{i+2}", "values": [_values(after[rid])]})
+            if added:
+                first = len(keep) + 2
+                data.append({"range": f"{name}!A{first}:{last}{first+len(added)-1}",
+                             "values": [_values(after[rid]) for rid in added]})
+            grid -= len(gone)
+            need = len(keep) + len(added) + 1
+            if need > grid:
+                requests.append({"appendDimension": {"sheetId": sid, "dimension": "ROWS", "length": need - grid}})
+                grid = need
+            order[name], grids[name], rows_after[name] = keep + added, grid, after
+        token = remote["token"]
+        if requests or data:
+            token = uuid.uuid4().hex   # 다른 PC가 변경을 알아채도록
+            data.append({"range": f"{META}!A1", "values": [[token]]})
+            if requests:
+                self._call("batch_update", {"requests": requests})
+            self._call("values_batch_update", {"valueInputOption": "RAW", "data": data})
+            for name, grid in grids.items():
+                self._sheets[name][1] = grid
+        return {"tables": tuple(merged), "order": order, "header": dict.fromkeys(TABLES, True),
+                "rows": rows_after, "token": token, "ts": remote["ts"]}
+
+    def _catch_up(self, target, ids):
+        # 로컬 캐시를 target 에 맞춘다. ids(테이블 -> ID)에 든 행만 비교하고 다른 행만 행 연산으로 고침 (None 이면 전체 비교)
+        ops = []
+        for (name, cols), have, want in zip(TABLES.items(), self.local.read(), target):
+            if ids is not None:
+                if not ids[name]:
+                    continue
+                have, want = have[have["ID"].isin(ids[name])], want[want["ID"].isin(ids[name])]
+            a, b = _rows(have, cols), _rows(want, cols)
+            ops += [{"op": "delete", "table": name, "id": i} for i in sorted(a.keys() - b.keys())]
+            rows = [dict(zip(cols, row)) for i, row in b.items() if a.get(i) != row]
+            if rows:
+                ops.append({"op": "insert_many", "table": name, "rows": rows})
+        if ops:
+            self.local.apply(ops)
+        return len(ops)
+
+    def sync(self):
+        # 한 번 동기화 → 보낸 연산 수
+        with self._sync_lock:
+            try:
+                self._ensure_sheets()
+                with self._lock:
+                    ops, offset = self._pending()
+                first = self._remote is None
+                remote, diff = self._pull()
+                tables = remote["tables"]
+                if first and not any(len(df) for df in tables):
+                    # 빈 시트: 이 PC의 캐시(엑셀에서 이관한 데이터 포함)를 통째로 올림
+                    with self._lock:
+                        ops = [{"op": "insert_many", "table": name, "rows": df.to_dict("records")}
+                               for name, df in zip(TABLES, self.local.read()) if len(df)]
+                for name, df in zip(TABLES, tables):
+                    self.local.reserve(name, 0, floor=max_id(df))   # 로컬에서 새로 내줄 ID는 원격 최대값 이후부터
+                ops, remap = self._rebase(remote, ops)
+                merged = apply_ops(tables, ops) if ops else tables
+                self._remote = self._push(remote, merged)
+                with self._lock:
+                    newer, _ = self._pending(offset)
+                    if any(remap.values()):
+                        newer = [_map_ids(op, remap) for op in newer]
+                    # 다른 PC의 변경/ID 재배치를 캐시에 반영 (동기화 중에 쌓인 연산은 그 위에 다시 적용).
+                    # 대기 중이던 연산은 이미 캐시에 적용돼 있으므로 원격에서 바뀐 행과 재배치된 ID만 확인하면 됨
+                    target = apply_ops(merged, newer) if newer else merged
+                    if diff is not None:
+                        moved = set(remap["Students"].values())   # 학생 ID 가 바뀌면 그 학생을 가리키는 행도 확인
+                        for (name, m), df in zip(remap.items(), target):
+                            diff[name] = diff[name] | m.keys() | set(m.values())
+                            if moved and "StudentID" in df:
+                                diff[name] |= set(df.loc[df["StudentID"].isin(moved), "ID"].tolist())
+                    if diff is None or any(diff.values()):
+                        self._catch_up(target, diff)
+                    if offset:
+                        self._reset_outbox(newer)
+                    self._status.update(last_sync=time.time(), last_error=None, failures=0)
+                return len(ops)
+            except Exception:
+                self._remote = self._sheets = None   # 원격 상태를 알 수 없으니 다음에는 전부 다시 읽음
+                raise
+
+    # ---- 백그라운드 동기화 ----
+    def _start(self):
+        if not self.autostart or self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._wake.set()   # 시작하자마자 한 번 동기화
+                self._thread = threading.Thread(target=self._loop, name="sheets-sync", daemon=True)
+                self._thread.start()
+
+    def _loop(self):
+        delay = 0
+        while True:
+            if delay:
+                time.sleep(delay)
+            else:
+                self._wake.wait(self.sync_seconds)
+            self._wake.clear()
+            time.sleep(max(0.0, self._last + storage.SHEETS_MIN_GAP - time.monotonic()))   # 쓰기가 몰려도 호출 간격 유지
+            try:
+                self.sync()
+                delay = 0
+            except Exception as e:
+                self._status["failures"] += 1
+                self._status["last_error"] = str(e)
+                delay = min(storage.SHEETS_RETRY_MAX, 2 ** self._status["failures"]) * random.uniform(0.5, 1.0)
+                log.warning("구글 시트 동기화 실패 (%d회째, %.1f초 후 재시도): %s", self._status["failures"], delay, e)
+            self._last = time.monotonic()
+
+# ================== 가짜 시트 (테스트/오프라인용) ==================
+# gspread.Spreadsheet 중 이 백엔드가 쓰는 메서드만 흉내 낸 메모리 시트. SheetsBackend 여러 개가 공유하면
+# 여러 PC가 같은 시트를 쓰는 상황이 된다. fail_next 로 할당량 초과 같은 API 오류를 낼 수 있다.
+class FakeAPIError(Exception):
+    pass
+
+class FakeWorksheet:
+    def __init__(self, sid, title, rows, cols):
+        self.id, self.title, self.row_count, self.col_count = sid, title, rows, cols
+        self.cells = {}   # (행, 열) 0부터 -> 값
+
+class FakeSpreadsheet:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sheets = {}
+        self.calls = Counter()
+        self.fail_next = 0
+
+    def _call(self, name):
+        self.calls[name] += 1
+        if self.fail_next:
+            self.fail_next -= 1
+            raise FakeAPIError("RESOURCE_EXHAUSTED: Quota exceeded")
+
+    def _range(self, a1):
+        m = re.fullmatch(r"([^!]+)(?:!([A-Z]+)(\d+)(?::([A-Z]+)(\d+))?)?", a1)
+        if not m or m.group(1) not in self._sheets:
+            raise FakeAPIError(f"Unable to parse range: {a1}")
+        ws = self._sheets[m.group(1)]
+        if m.group(2) is None:
+            return ws, 0, 0, ws.row_count - 1, ws.col_count - 1
+        c0, r0 = ord(m.group(2)) - ord("A"), int(m.group(3)) - 1
+        c1, r1 = (ord(m.group(4)) - ord("A"), int(m.group(5)) - 1) if m.group(4) else (c0, r0)
+        return ws, r0, c0, r1, c1
+
+    def worksheets(self):
+        with self._lock:
+            self._call("worksheets")
+            return list(self._sheets.values())
+
+    def add_worksheet(self, title, rows, cols, index=None):
+        with self._lock:
+            self._call("add_worksheet")
+            ws = self._sheets[title] = FakeWorksheet(len(self._sheets) + 1, title, rows, cols)
+            return ws
+
+    def values_batch_get(self, ranges, params=None):
+        with self._lock:
+            self._call("values_batch_get")
+            out = []
+            for a1 in ranges:
+                ws, r0, c0, r1, c1 = self._range(a1)
+                rows = [[ws.cells.get((r, c), "") for c in range(c0, c1 + 1)] for r in range(r0, min(r1, ws.row_count - 1) + 1)]
+                for row in rows:   # 실제 API처럼 끝의 빈 칸/빈 행은 빼고 돌려줌
+                    while row and row[-1] == "":
+                        row.pop()
+                while rows and not rows[-1]:
+                    rows.pop()
+                out.append({"range": a1, "values": rows} if rows else {"range": a1})
+            return {"valueRanges": out}
+
+    def values_batch_update(self, body):
+        with self._lock:
+            self._call("values_batch_update")
+            for d in body["data"]:
+                ws, r0, c0, _, _ = self._range(d["range"])
+                if r0 + len(d["values"]) > ws.row_count:
+                    raise FakeAPIError(f"Range ({d['range']}) exceeds grid limits")
+            for d in body["data"]:
+                ws, r0, c0, _, _ = self._range(d["range"])
+                for i, row in enumerate(d["values"]):
+                    for j, v in enumerate(row):
+                        if v == "":
+                            ws.cells.pop((r0 + i, c0 + j), None)
+                        else:
+                            ws.cells[(r0 + i, c0 + j)] = v
+
+    def batch_update(self, body):
+        with self._lock:
+            self._call("batch_update")
+            by_id = {ws.id: ws for ws in self._sheets.values()}
+            for req in body["requests"]:
+                if "deleteDimension" in req:
+                    rng = req["deleteDimension"]["range"]
+                    ws, start, end = by_id[rng["sheetId"]], rng["startIndex"], rng["endIndex"]
+                    n = end - start
+                    ws.cells = {(r - n if r >= end else r, c): v for (r, c), v in ws.cells.items() if not start <= r < end}
+                    ws.row_count -= n
+                elif "appendDimension" in req:
+                    by_id[req["appendDimension"]["sheetId"]].row_count += req["appendDimension"]["length"]
+                else:
+                    raise FakeAPIError(f"지원하지 않는 요청: {list(req)}")
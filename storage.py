@@ -0,0 +1,1069 @@
+import datetime
+import json
+import logging
+import math
+import os
+import sqlite3
+import queue
+import threading
+import time
+from collections import Counter, OrderedDict
+from concurrent.futures import Future
+from pathlib import Path
+
+import pandas as pd
+
+from timing import span
+
+log = logging.getLogger(__name__)
+
+# ================== 설정 ==================
+DATA_FILE = Path("data.xlsx")   # 엑셀 백엔드 저장 파일 / SQLite 최초 마이그레이션 원본
+DB_FILE = Path("data.db")
+ARCHIVE_DIR = Path("archive")   # 마감한 학년도 보관 파일 (archive.py)
+STORAGE_BACKEND = "sqlite"      # "sqlite" | "excel" | "sheets"
+JOURNAL_COMPACT_BYTES = 512 * 1024   # 엑셀 저널이 이 크기를 넘거나
+JOURNAL_COMPACT_SECONDS = 10 * 60    # 가장 오래된 기록이 이 시간을 넘으면 data.xlsx 로 압축
+WRITE_BATCH_WINDOW = 0.02   # 이 시간 안에 들어온 쓰기 명령은 한 번에 커밋
+WRITE_BATCH_MAX = 200
+WRITE_TIMEOUT = 30
+# 구글 시트 백엔드 (sheets.py)
+SHEETS_KEY = ""                                 # 스프레드시트 ID (URL 의 /d/<ID>/)
+SHEETS_CREDENTIALS = Path("service_account.json")
+SHEETS_CACHE_FILE = Path("sheets_cache.db")     # PC별 로컬 캐시
+SHEETS_SYNC_SECONDS = 5          # 원격 변경 확인 주기 (쓰기가 있으면 바로 동기화)
+SHEETS_FULL_PULL_SECONDS = 300   # 변경 토큰과 상관없이 전체를 다시 읽는 주기 (시트를 직접 고친 것 확인용)
+SHEETS_MIN_GAP = 1.0             # 동기화 사이 최소 간격 (분당 API 할당량 대비)
+SHEETS_RETRY_MAX = 60            # 실패 시 재시도 간격 상한 (지수 백오프)
+
+# 내부 저장 컬럼 (영문 컬럼으로 저장, 화면은 한글 표시)
+STU_COLS = ["ID","Name","StudentNo","Gender","Room","Phone","ParentPhone","Address","MiddleSchool","InDate","OutDate","Password","Note"]
+OUT_COLS = ["ID","StudentID","Type","Reason","StartDate","EndDate","Status"]
+SCO_COLS = ["ID","StudentID","Category","Points","Reason","Date"]
+PAY_COLS = ["ID","StudentID","Period","Amount","Status","PayDate","Method","Note"]
+TABLES = {"Students": STU_COLS, "Outings": OUT_COLS, "Scores": SCO_COLS, "Payments": PAY_COLS}
+INT_COLS = {"ID", "StudentID", "Points", "Amount"}
+DATE_COLS = {"InDate", "OutDate", "StartDate", "EndDate", "Date", "PayDate"}
+CATEGORIES = {   # (테이블, 컬럼) -> 알려진 값 (그 밖의 값이 들어오면 범주에 추가)
+    ("Students", "Gender"): ["남","여"],
+    ("Outings", "Type"): ["외출","외박"],
+    ("Outings", "Status"): ["신청","대기","승인","반려","취소"],
+    ("Scores", "Category"): ["상점","벌점"],
+    ("Payments", "Status"): ["납부","미납"],
+    ("Payments", "Method"): ["현금","카드","이체","기타"],
+}
+
+# ================== 스키마 ==================
+# 백엔드가 돌려주는 프레임은 컬럼마다 정해진 타입으로 맞춘다: 정수는 nullable Int64, 날짜는 datetime64(NaT = 빈 값),
+# 코드성 컬럼은 category, 나머지 글자 컬럼(학번 포함)은 str 만 담은 object("" = 빈 값).
+# 엑셀이 숫자로 읽은 학번/연락처(10101.0)도 '10101' 로 맞춘다. 저장할 때는 _py 가 ISO 날짜/int/None 으로 되돌린다.
+def col_kind(table, col):
+    if col in INT_COLS:
+        return "int"
+    if col in DATE_COLS:
+        return "date"
+    return "category" if (table, col) in CATEGORIES else "text"
+
+def _str(v):
+    if v is None or v is pd.NA or v is pd.NaT or (isinstance(v, float) and math.isnan(v)):
+        return ""
+    if isinstance(v, float) and v.is_integer():
+        v = int(v)
+    return str(v)
+
+def _typed_col(table, col, s, full=True):
+    kind = col_kind(table, col)
+    if kind == "int":
+        return s if s.dtype == "Int64" else pd.to_numeric(s, errors="coerce").round().astype("Int64")
+    if kind == "date":
+        if pd.api.types.is_datetime64_any_dtype(s):
+            return s
+        return pd.to_datetime(s.where(s != "", None), errors="coerce", format="ISO8601")
+    if kind == "category":
+        if isinstance(s.dtype, pd.CategoricalDtype):
+            return s
+        known = CATEGORIES[(table, col)]
+        vals = s.map(_str)
+        return vals.astype(pd.CategoricalDtype(known + sorted(set(vals.unique()) - set(known))))
+    if s.dtype == object and (not full or pd.api.types.infer_dtype(s, skipna=False) in ("string", "empty")):
+        return s
+    return s.map(_str).astype(object)
+
+def typed(table, df, full=True):
+    # 프레임을 스키마 타입으로 (컬럼 순서도 TABLES 대로). full=False 면 object 글자 컬럼은 이미 깨끗하다고 보고 건너뜀
+    cols = TABLES[table]
+    if list(df.columns) != cols:
+        df = df.reindex(columns=cols)
+    return pd.DataFrame({c: _typed_col(table, c, df[c], full) for c in cols}, index=df.index)
+
+def text_dtypes(table):
+    # 엑셀에서 읽을 때 글자로 읽을 컬럼 (학번 '01234', 비밀번호 '0012' 의 앞자리 0 보존)
+    return {c: str for c in TABLES[table] if col_kind(table, c) in ("text", "category")}
+
+def scalar(table, col, v):
+    # 연산 값 하나를 컬럼 타입에 맞춘 값으로 (update 적용용)
+    return _typed_col(table, col, pd.Series([v], dtype=object)).iloc[0]
+
+def date_text(s):
+    # 날짜 컬럼 → 'YYYY-MM-DD' 문자열 Series ("" = 빈 값)
+    if not pd.api.types.is_datetime64_any_dtype(s):
+        s = pd.to_datetime(s.where(s != "", None), errors="coerce", format="ISO8601")
+    return s.dt.strftime("%Y-%m-%d").fillna("")
+
+def stored(table, df):
+    # 파일(엑셀)에 쓸 형태: 날짜는 'YYYY-MM-DD' 문자열
+    return df.assign(**{c: date_text(df[c]) for c in df.columns if col_kind(table, c) == "date"})
+
+# ================== 변경 연산 ==================
+# 폼 처리기는 전체 테이블 대신 행 단위 연산(dict)을 넘긴다. 모든 연산은 같은 연산을 다시 적용해도 결과가 같다.
+#   {"op": "insert", "table": T, "row": {...}}              (같은 ID가 있으면 교체)
+#   {"op": "insert_many", "table": T, "rows": [{...}, ...]} (일괄 입력. 행마다 insert 와 같음)
+#   {"op": "update", "table": T, "id": ID, "values": {...}}
+#   {"op": "update_many", "table": T, "ids": [ID, ...], "values": {...}}   (여러 행에 같은 값)
+#   {"op": "delete", "table": T, "id": ID}
+#   {"op": "delete_student", "id": SID, "cascade": bool}    (cascade=True 면 외출·외박/상벌점/납부도 삭제)
+def _check(table, cols=()):
+    if table not in TABLES:
+        raise KeyError(f"알 수 없는 테이블: {table}")
+    unknown = set(cols) - set(TABLES[table])
+    if unknown:
+        raise KeyError(f"{table} 에 없는 컬럼: {sorted(unknown)}")
+
+def _py(v, col=None):
+    # numpy/pandas 값 → sqlite/json 에 넣을 수 있는 파이썬 값 ("" 와 NaN 은 None)
+    if v is None or v is pd.NA or v is pd.NaT or (isinstance(v, str) and v == ""):
+        return None
+    if hasattr(v, "item") and not isinstance(v, (str, bytes)):
+        v = v.item()
+    if isinstance(v, float) and math.isnan(v):
+        return None
+    if isinstance(v, (pd.Timestamp, datetime.datetime)):
+        v = v.date().isoformat() if v.time() == datetime.time() else v.isoformat()
+    elif isinstance(v, datetime.date):
+        v = v.isoformat()
+    if col in INT_COLS:
+        return int(v)
+    if isinstance(v, float) and v.is_integer():
+        v = int(v)            # 엑셀이 학번 등을 실수로 읽은 경우
+    return v if isinstance(v, str) or col is None else str(v)
+
+def max_id(df):
+    # 시퀀스 초기값/보정용. 평소 ID 발급은 reserve_ids() (전체 컬럼 스캔 없음)
+    if df.empty:
+        return 0
+    m = pd.to_numeric(df["ID"], errors="coerce").max()
+    return 0 if pd.isna(m) else int(m)
+
+def check_op(op):
+    kind = op.get("op")
+    if kind in ("insert", "update", "update_many", "delete"):
+        _check(op["table"], op.get("row") or op.get("values") or ())
+    elif kind == "insert_many":
+        _check(op["table"], {c for row in op["rows"] for c in row})
+    elif kind != "delete_student":
+        raise ValueError(f"알 수 없는 연산: {kind}")
+
+def touched_tables(ops):
+    names = set()
+    for op in ops:
+        if op["op"] == "delete_student":
+            names.add("Students")
+            if op.get("cascade"):
+                names.update(("Outings", "Scores", "Payments"))
+        else:
+            names.add(op["table"])
+    return names
+
+def apply_ops(tables, ops):
+    # DataFrame 4개에 연산을 적용한 새 튜플 반환 (입력 프레임은 수정하지 않고, 바뀌지 않은 테이블은 같은 객체 유지)
+    # insert/insert_many 행은 테이블마다 모아 두었다가, 그 테이블을 건드리는 다른 연산 앞이나 끝에서 concat 한 번으로 붙인다
+    t = dict(zip(TABLES, tables))
+    pending = {}   # 테이블 -> 아직 붙이지 않은 insert 행들
+
+    def flush(names):
+        for name in names:
+            rows = pending.pop(name, None)
+            if not rows:
+                continue
+            new = typed(name, pd.DataFrame(rows)).drop_duplicates("ID", keep="last").reset_index(drop=True)
+            df = t[name]
+            df = df[~df["ID"].isin(new["ID"])]
+            t[name] = typed(name, pd.concat([df, new], ignore_index=True), full=False) if len(df) else new
+
+    for op in ops:
+        kind = op["op"]
+        if kind == "insert":
+            pending.setdefault(op["table"], []).append(op["row"])
+        elif kind == "insert_many":
+            pending.setdefault(op["table"], []).extend(op["rows"])
+        elif kind in ("update", "update_many"):
+            name = op["table"]
+            flush([name])
+            df = typed(name, t[name], full=False)
+            m = (df["ID"] == op["id"]) if kind == "update" else df["ID"].isin(op["ids"])
+            for k, v in op["values"].items():
+                v = scalar(name, k, v)
+                if col_kind(name, k) == "category" and v not in df[k].cat.categories:
+                    df[k] = df[k].cat.add_categories([v])
+                df.loc[m, k] = v
+            t[name] = df
+        elif kind == "delete":
+            flush([op["table"]])
+            df = t[op["table"]]
+            t[op["table"]] = df[df["ID"] != op["id"]].copy()
+        elif kind == "delete_student":
+            flush(TABLES)
+            sid = op["id"]
+            t["Students"] = t["Students"][t["Students"]["ID"] != sid].copy()
+            if op.get("cascade"):
+                for name in ("Outings", "Scores", "Payments"):
+                    t[name] = t[name][t[name]["StudentID"] != sid].copy()
+        else:
+            raise ValueError(f"알 수 없는 연산: {kind}")
+    flush(list(pending))
+    return tuple(t[n] for n in TABLES)
+
+# ================== 엑셀 백엔드 ==================
+# data.xlsx 는 마지막 압축 시점의 스냅샷이고, 이후 변경은 옆의 저널(data.xlsx.journal, JSON lines)에
+# 연산 단위로 추가 후 fsync 한다. 읽을 때는 스냅샷 위에 저널을 재생하며, 저널이 커지거나 오래되면
+# 백그라운드에서 임시 파일에 통합 저장 후 교체(os.replace)하므로 쓰다 만 통합문서가 남지 않는다.
+# 압축 직후 죽어 저널이 다시 재생되더라도 연산이 멱등이라 결과는 같다.
+def _from_json(op):
+    op = dict(op)
+    for k in ("row", "values"):
+        if k in op:
+            op[k] = {c: ("" if v is None else v) for c, v in op[k].items()}
+    if "rows" in op:
+        op["rows"] = [{c: ("" if v is None else v) for c, v in row.items()} for row in op["rows"]]
+    return op
+
+class ExcelBackend:
+    name = "excel"
+
+    def __init__(self, path, compact_bytes=None, compact_seconds=None):
+        self.path = Path(path)
+        self.journal = self.path.with_name(self.path.name + ".journal")
+        self.seq_file = self.path.with_name(self.path.name + ".seq")
+        self.compact_bytes = compact_bytes or JOURNAL_COMPACT_BYTES
+        self.compact_seconds = compact_seconds or JOURNAL_COMPACT_SECONDS
+        self._lock = threading.RLock()
+        self._state = None        # (스냅샷 키, 재생한 저널 오프셋, tables)
+        self._first_ts = None     # 저널 첫 기록 시각
+        self._compactor = None
+        self._seqs = None         # 테이블 -> 마지막으로 내준 ID
+
+    def _ensure(self):
+        if not self.path.exists():
+            with pd.ExcelWriter(self.path, engine="openpyxl") as w:
+                pd.DataFrame(columns=STU_COLS).to_excel(w, sheet_name="Students", index=False)
+                pd.DataFrame(columns=OUT_COLS).to_excel(w, sheet_name="Outings", index=False)
+                pd.DataFrame(columns=SCO_COLS).to_excel(w, sheet_name="Scores", index=False)
+                pd.DataFrame(columns=PAY_COLS).to_excel(w, sheet_name="Payments", index=False)
+
+    def _snap_key(self):
+        s = self.path.stat()
+        return (s.st_mtime_ns, s.st_size)
+
+    def _journal_size(self):
+        try:
+            return self.journal.stat().st_size
+        except FileNotFoundError:
+            return 0
+
+    def version(self):
+        with self._lock:
+            self._ensure()
+            return self._snap_key() + (self._journal_size(),)
+
+    def _parse(self):
+        xls = pd.ExcelFile(self.path, engine="openpyxl")
+        return tuple(typed(name, pd.read_excel(xls, name, dtype=text_dtypes(name))) for name in TABLES)
+
+    def _replay(self, tables, start):
+        # start 바이트부터 저널 재생 → (tables, 재생이 끝난 오프셋). 쓰다 만 마지막 줄은 남겨둔다
+        if not self.journal.exists():
+            return tables, 0
+        with open(self.journal, "rb") as f:
+            f.seek(start)
+            data = f.read()
+        ops, end = [], start
+        for line in data.splitlines(keepends=True):
+            if not line.endswith(b"\n"):
+                break
+            end += len(line)
+            try:
+                ops.append(_from_json(json.loads(line)))
+            except ValueError:
+                log.warning("%s: 손상된 저널 줄 건너뜀 %r", self.journal, line[:80])
+        return (apply_ops(tables, ops) if ops else tables), end
+
+    def _current(self):
+        self._ensure()
+        key, size = self._snap_key(), self._journal_size()
+        if self._state and self._state[0] == key and self._state[1] <= size:
+            tables, offset = self._state[2], self._state[1]   # 새로 추가된 저널만 재생
+        else:
+            tables, offset = self._parse(), 0
+        tables, offset = self._replay(tables, offset)
+        self._state = (key, offset, tables)
+        return tables
+
+    def read(self):
+        with self._lock:
+            tables = self._current()
+            self._maybe_compact()
+            return tables
+
+    def _write_file(self, path, tables):
+        students, outings, scores, payments = (stored(name, df) for name, df in zip(TABLES, tables))
+        with pd.ExcelWriter(path, engine="openpyxl") as w:  # 통합 저장 (append 모드 사용 안 함)
+            students.to_excel(w, sheet_name="Students", index=False)
+            outings.to_excel(w,  sheet_name="Outings", index=False)
+            scores.to_excel(w,   sheet_name="Scores", index=False)
+            payments.to_excel(w, sheet_name="Payments", index=False)
+        with open(path, "rb+") as f:
+            os.fsync(f.fileno())
+
+    def write(self, tables):
+        # 전체 교체: 새 스냅샷으로 바꾸고 저널 비움
+        with self._lock:
+            self._seed(self._current())
+            tmp = self.path.with_name(self.path.name + ".tmp")
+            self._write_file(tmp, tables)
+            os.replace(tmp, self.path)
+            self.journal.unlink(missing_ok=True)
+            self._state, self._first_ts = None, None
+            self._seed(tables)
+
+    # ---- ID 시퀀스 (data.xlsx.seq) ----
+    def _seed(self, tables):
+        # 시퀀스를 tables 의 최대 ID 이상으로 (지운 행의 ID 를 다시 내주지 않도록, 행을 지우거나 바꾸기 전에 부름)
+        seqs = self._load_seqs()
+        for name, df in zip(TABLES, tables):
+            seqs[name] = max(seqs.get(name, 0), max_id(df))
+        self._save_seqs(seqs)
+
+    def _load_seqs(self):
+        if self._seqs is None:
+            try:
+                self._seqs = json.loads(self.seq_file.read_text(encoding="utf-8"))
+            except FileNotFoundError:
+                self._seqs = {}
+        return self._seqs
+
+    def _save_seqs(self, seqs):
+        tmp = self.seq_file.with_name(self.seq_file.name + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(seqs, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.seq_file)
+
+    def reserve(self, table, n=1, floor=0):
+        # n개 연속 ID 예약 → 첫 ID. floor 이하의 ID는 내주지 않음 (n=0 이면 floor 까지 올리기만)
+        _check(table)
+        with self._lock:
+            seqs = self._load_seqs()
+            if table not in seqs:
+                seqs[table] = max_id(self._current()[list(TABLES).index(table)])
+            last = max(seqs[table], int(floor))
+            seqs[table] = last + n
+            self._save_seqs(seqs)
+            return last + 1
+
+    def apply(self, ops):
+        for op in ops:
+            check_op(op)
+        with self._lock:
+            self._ensure()
+            if any(name not in self._load_seqs() for name in TABLES):   # 시퀀스 파일이 없던 data.xlsx
+                self._seed(self._current())
+            with open(self.journal, "ab+") as f:
+                if f.tell():
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b"\n":   # 직전에 쓰다 만 줄 끊기
+                        f.write(b"\n")
+                for op in ops:
+                    rec = dict(op, ts=time.time())
+                    f.write((json.dumps(rec, ensure_ascii=False, default=_py) + "\n").encode("utf-8"))
+                    f.flush()
+                    os.fsync(f.fileno())
+            self._maybe_compact()
+
+    def _maybe_compact(self):
+        size = self._journal_size()
+        if not size or (self._compactor and self._compactor.is_alive()):
+            return
+        if self._first_ts is None:
+            with open(self.journal, "rb") as f:
+                try:
+                    self._first_ts = json.loads(f.readline())["ts"]
+                except (ValueError, KeyError):
+                    self._first_ts = time.time()
+        if size >= self.compact_bytes or time.time() - self._first_ts >= self.compact_seconds:
+            self._compactor = threading.Thread(target=self.compact, name="excel-compactor", daemon=True)
+            self._compactor.start()
+
+    def compact(self):
+        # 저널을 스냅샷에 접어 넣는다. 엑셀 저장은 잠금 밖에서 하므로 그동안에도 저널 추가 가능
+        with self._lock:
+            tables = self._current()
+            key, offset = self._state[0], self._state[1]
+        if not offset:
+            return
+        tmp = self.path.with_name(self.path.name + ".compact.tmp")   # write() 의 임시 파일과 겹치지 않게
+        self._write_file(tmp, tables)
+        with self._lock:
+            if self._snap_key() != key:     # 그 사이 전체 저장(write)이 있었음
+                tmp.unlink(missing_ok=True)
+                return
+            os.replace(tmp, self.path)
+            with open(self.journal, "rb") as f:
+                f.seek(offset)
+                rest = f.read()
+            jtmp = self.journal.with_name(self.journal.name + ".tmp")
+            with open(jtmp, "wb") as f:
+                f.write(rest)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(jtmp, self.journal)
+            self._state, self._first_ts = (self._snap_key(), 0, tables), None
+        log.info("%s: 저널 %d바이트 압축 완료", self.path, offset)
+
+# ================== SQLite 백엔드 ==================
+_INDEXES = [
+    ("Students", ("StudentNo",)),
+    ("Outings", ("StudentID",)), ("Outings", ("Status",)), ("Outings", ("StartDate", "EndDate")),
+    ("Scores", ("StudentID",)), ("Scores", ("Date",)),
+    ("Payments", ("StudentID",)), ("Payments", ("Status",)), ("Payments", ("PayDate",)),
+]
+
+def _sql_type(col):
+    if col == "ID":
+        return "INTEGER PRIMARY KEY"
+    return "INTEGER" if col in INT_COLS else "TEXT"
+
+class SqliteBackend:
+    name = "sqlite"
+
+    def __init__(self, path, migrate_from=None):
+        self.path = Path(path)
+        self.migrate_from = Path(migrate_from) if migrate_from else None
+        self._ready = False
+        self._frames = {}   # 테이블 -> (gen:<테이블> 값, DataFrame). 바뀐 테이블만 다시 읽는다
+
+    def connect(self):
+        con = sqlite3.connect(self.path, timeout=30)
+        con.execute("PRAGMA foreign_keys=OFF")
+        return con
+
+    def _ensure(self):
+        if self._ready and self.path.exists():
+            return
+        fresh = not self.path.exists()
+        con = self.connect()
+        try:
+            with con:
+                con.execute("PRAGMA journal_mode=WAL")
+                for name, cols in TABLES.items():
+                    body = ", ".join(f'"{c}" {_sql_type(c)}' for c in cols)
+                    con.execute(f'CREATE TABLE IF NOT EXISTS "{name}" ({body})')
+                for name, cols in _INDEXES:
+                    idx = f"ix_{name}_{'_'.join(cols)}"
+                    con.execute(f'CREATE INDEX IF NOT EXISTS "{idx}" ON "{name}" ({", ".join(cols)})')
+                con.execute("CREATE TABLE IF NOT EXISTS Meta (Key TEXT PRIMARY KEY, Value INTEGER)")
+                con.execute("INSERT OR IGNORE INTO Meta VALUES ('generation', 0)")
+                for name in TABLES:   # 시퀀스가 없던 DB 는 지금 있는 최대 ID 에서 시작 (이후 지운 ID 를 다시 내주지 않음)
+                    con.execute(f'INSERT OR IGNORE INTO Meta SELECT ?, COALESCE(MAX(ID), 0) FROM "{name}"', (f"seq:{name}",))
+        finally:
+            con.close()
+        self._ready = True
+        if fresh and self.migrate_from and self.migrate_from.exists():
+            migrate_excel(self.migrate_from, self)
+
+    def version(self):
+        self._ensure()
+        con = self.connect()
+        try:
+            return con.execute("SELECT Value FROM Meta WHERE Key='generation'").fetchone()[0]
+        finally:
+            con.close()
+
+    def read(self):
+        self._ensure()
+        con = self.connect()
+        try:
+            with con:  # 세대 조회와 테이블 읽기를 같은 스냅샷에서
+                con.execute("BEGIN")
+                gens = dict(con.execute("SELECT Key, Value FROM Meta WHERE Key LIKE 'gen:%'").fetchall())
+                out = []
+                for name in TABLES:
+                    gen = gens.get(f"gen:{name}", 0)
+                    hit = self._frames.get(name)
+                    if hit is None or hit[0] != gen:
+                        hit = (gen, typed(name, pd.read_sql_query(f'SELECT * FROM "{name}" ORDER BY ID', con)))
+                        self._frames[name] = hit
+                    out.append(hit[1])
+            return tuple(out)
+        finally:
+            con.close()
+
+    def _bump(self, con, names=TABLES):
+        con.execute("UPDATE Meta SET Value = Value + 1 WHERE Key='generation'")
+        for name in names:
+            con.execute("INSERT INTO Meta VALUES (?, 1) ON CONFLICT(Key) DO UPDATE SET Value = Value + 1",
+                        (f"gen:{name}",))
+
+    def write(self, tables):
+        self._ensure()
+        con = self.connect()
+        try:
+            with con:
+                for (name, cols), df in zip(TABLES.items(), tables):
+                    # 시퀀스는 지우기 전의 최대 ID, 새 행의 최대 ID 중 큰 값 이상으로
+                    old = con.execute(f'SELECT COALESCE(MAX(ID), 0) FROM "{name}"').fetchone()[0]
+                    con.execute("INSERT INTO Meta VALUES (?, ?) ON CONFLICT(Key) DO UPDATE SET Value = MAX(Value, excluded.Value)",
+                                (f"seq:{name}", max(old, max_id(df))))
+                    con.execute(f'DELETE FROM "{name}"')
+                    df = df.reindex(columns=cols)
+                    rows = [tuple(_py(v, c) for v, c in zip(r, cols)) for r in df.itertuples(index=False)]
+                    con.executemany(f'INSERT INTO "{name}" VALUES ({", ".join("?" * len(cols))})', rows)
+                self._bump(con)
+        finally:
+            con.close()
+
+    def reserve(self, table, n=1, floor=0):
+        # 테이블별 ID 시퀀스(Meta 의 seq:<테이블>)에서 n개 연속 예약 → 첫 ID
+        _check(table)
+        self._ensure()
+        con = self.connect()
+        con.isolation_level = None
+        try:
+            con.execute("BEGIN IMMEDIATE")   # 다른 프로세스와도 원자적으로
+            try:
+                key = f"seq:{table}"
+                row = con.execute("SELECT Value FROM Meta WHERE Key=?", (key,)).fetchone()
+                last = row[0] if row else (con.execute(f'SELECT MAX(ID) FROM "{table}"').fetchone()[0] or 0)
+                last = max(last, int(floor))
+                con.execute("INSERT OR REPLACE INTO Meta VALUES (?, ?)", (key, last + n))
+                con.execute("COMMIT")
+            except BaseException:
+                con.execute("ROLLBACK")
+                raise
+            return last + 1
+        finally:
+            con.close()
+
+    def apply(self, ops):
+        self._ensure()
+        names = touched_tables(ops)
+        con = self.connect()
+        try:
+            with con:  # 한 트랜잭션
+                for op in ops:
+                    self._exec(con, op)
+                self._bump(con, names)
+                gens = dict(con.execute("SELECT Key, Value FROM Meta WHERE Key LIKE 'gen:%'").fetchall())
+        finally:
+            con.close()
+        self._advance(ops, names, gens)
+
+    def _advance(self, ops, names, gens):
+        # 바로 이전 세대의 프레임을 들고 있는 테이블은 같은 연산을 적용해 이어감 (바뀐 행 때문에 테이블 전체를 다시 읽지 않음).
+        # 그 사이 다른 프로세스가 쓴 테이블은 세대가 맞지 않으므로 다음 read() 에서 다시 읽는다
+        ok = {n for n in names if (self._frames.get(n) or (None,))[0] == gens.get(f"gen:{n}", 0) - 1}
+        if not ok:
+            return
+        tables = tuple(self._frames[n][1] if n in self._frames else typed(n, pd.DataFrame(columns=cols))
+                       for n, cols in TABLES.items())
+        for name, df in zip(TABLES, apply_ops(tables, ops)):
+            if name in ok:
+                self._frames[name] = (gens[f"gen:{name}"], df)
+
+    def _exec(self, con, op):
+        kind = op["op"]
+        if kind == "insert":
+            _check(op["table"], op["row"])
+            cols = list(op["row"])
+            con.execute(f'INSERT OR REPLACE INTO "{op["table"]}" ({", ".join(cols)}) VALUES ({", ".join("?" * len(cols))})',
+                        [_py(op["row"][c], c) for c in cols])
+        elif kind == "insert_many":
+            _check(op["table"], {c for row in op["rows"] for c in row})
+            cols = [c for c in TABLES[op["table"]] if any(c in row for row in op["rows"])]
+            con.executemany(f'INSERT OR REPLACE INTO "{op["table"]}" ({", ".join(cols)}) VALUES ({", ".join("?" * len(cols))})',
+                            [[_py(row.get(c), c) for c in cols] for row in op["rows"]])
+        elif kind == "update":
+            _check(op["table"], op["values"])
+            cols = list(op["values"])
+            con.execute(f'UPDATE "{op["table"]}" SET {", ".join(c + "=?" for c in cols)} WHERE ID=?',
+                        [_py(op["values"][c], c) for c in cols] + [int(op["id"])])
+        elif kind == "update_many":
+            _check(op["table"], op["values"])
+            cols = list(op["values"])
+            vals = [_py(op["values"][c], c) for c in cols]
+            con.executemany(f'UPDATE "{op["table"]}" SET {", ".join(c + "=?" for c in cols)} WHERE ID=?',
+                            [vals + [int(i)] for i in op["ids"]])
+        elif kind == "delete":
+            _check(op["table"])
+            con.execute(f'DELETE FROM "{op["table"]}" WHERE ID=?', (int(op["id"]),))
+        elif kind == "delete_student":
+            sid = int(op["id"])
+            con.execute('DELETE FROM "Students" WHERE ID=?', (sid,))
+            if op.get("cascade"):
+                for name in ("Outings", "Scores", "Payments"):
+                    con.execute(f'DELETE FROM "{name}" WHERE StudentID=?', (sid,))
+        else:
+            raise ValueError(f"알 수 없는 연산: {kind}")
+
+def migrate_excel(xlsx, db):
+    # 기존 data.xlsx → SQLite 1회 이관 (원본 엑셀은 그대로 둔다)
+    src = ExcelBackend(xlsx)
+    tables = src.read()
+    db.write(tables)
+    for name, last in src._load_seqs().items():   # 엑셀 쪽 시퀀스(지운 행의 ID 포함)도 이어받음
+        db.reserve(name, 0, floor=last)
+    log.info("%s → %s 이관 완료: %s", xlsx, db.path, {n: len(t) for n, t in zip(TABLES, tables)})
+
+def make_backend(kind=None):
+    kind = kind or STORAGE_BACKEND
+    if kind == "sqlite":
+        return SqliteBackend(DB_FILE, migrate_from=DATA_FILE)
+    if kind == "excel":
+        return ExcelBackend(DATA_FILE)
+    if kind == "sheets":
+        from sheets import SheetsBackend, open_spreadsheet
+        return SheetsBackend(open_spreadsheet(SHEETS_KEY, SHEETS_CREDENTIALS), SHEETS_CACHE_FILE, migrate_from=DATA_FILE)
+    raise ValueError(f"알 수 없는 저장소: {kind}")
+
+# ================== 캐시 ==================
+# 스트림릿은 app.py 를 매 rerun 마다 다시 실행하므로, 세션 간 공유 캐시는 이 모듈(한 번만 import)에 둔다.
+# 캐시 키는 백엔드 버전(엑셀: mtime·크기 / SQLite: 저장된 세대 카운터) + 프로세스 내 저장 세대 카운터.
+# 반환되는 DataFrame 은 모든 탭/세션이 공유하므로 호출 측에서 직접 수정하지 말 것.
+_lock = threading.RLock()
+_backend = None
+_cache = {"key": None, "tables": None}
+_generation = 0
+_stats = {}              # 날짜(ISO) -> {"parse", "hit", "invalidate"}
+STATS_KEEP_DAYS = 31
+
+def backend():
+    global _backend
+    with _lock:
+        if _backend is None:
+            _backend = make_backend()
+        return _backend
+
+def _bump(kind):
+    day = datetime.date.today().isoformat()
+    if day not in _stats:
+        _stats[day] = {"parse": 0, "hit": 0, "invalidate": 0}
+        for old in sorted(_stats)[:-STATS_KEEP_DAYS]:
+            del _stats[old]
+    _stats[day][kind] += 1
+
+def _version():
+    return (backend().version(), _generation)
+
+def invalidate():
+    global _generation
+    with _lock:
+        _cache["key"] = _cache["tables"] = None
+        _generation += 1
+        _bump("invalidate")
+
+def cache_stats(day=None):
+    # 일자별 파싱/적중/무효화 횟수 (day 미지정 시 전체)
+    with _lock:
+        if day is not None:
+            return dict(_stats.get(day, {"parse": 0, "hit": 0, "invalidate": 0}))
+        return {d: dict(v) for d, v in _stats.items()}
+
+def sync_status():
+    # 원격 동기화 백엔드(sheets)의 대기 연산 수/마지막 동기화/오류. 그 밖의 백엔드는 None
+    b = backend()
+    return b.sync_status() if hasattr(b, "sync_status") else None
+
+# ================== 입출력 ==================
+def _rows(tables):
+    return {name: len(df) for name, df in zip(TABLES, tables)}
+
+def load_all():
+    with span("load_all") as f, _lock:  # 같은 버전은 한 번만 읽음 (동시 요청은 대기 후 캐시 적중)
+        key = _version()
+        if _cache["key"] == key:
+            _bump("hit")
+            f["rows"] = _rows(_cache["tables"])
+            return _cache["tables"]
+        with span("load_all.read", backend=backend().name) as r:
+            tables = backend().read()
+            f["rows"] = r["rows"] = _rows(tables)
+        _cache["key"], _cache["tables"] = key, tables
+        _bump("parse")
+        return tables
+
+def save_all(students, outings, scores, payments):
+    # 전체 교체 저장 (일괄 작업용). 폼 처리는 아래 행 단위 함수를 사용
+    global _seq, _touched_floor
+    with span("save_all", rows=_rows((students, outings, scores, payments))), _lock:
+        backend().write((students, outings, scores, payments))
+        invalidate()
+        _seq += 1
+        _touched.clear()
+        _touched_floor = _seq   # 이전 버전을 기준으로 한 수정/삭제는 모두 충돌
+
+def rewrite(fn):
+    # 일괄 작업(학년도 마감 등): 쓰기 큐를 멈춘 채 fn(현재 tables) → (새 tables, 결과). 바뀐 테이블이 있으면 전체 교체 저장
+    with _lock:
+        tables = load_all()
+        new, result = fn(tables)
+        if any(a is not b for a, b in zip(tables, new)):
+            save_all(*new)
+        return result
+
+# ================== 쓰기 큐 ==================
+# 모든 세션의 쓰기 명령(행 단위 연산 묶음)은 데이터 파일마다 하나인 쓰기 스레드가 받아
+# WRITE_BATCH_WINDOW 안에 모인 것을 한 번에 커밋한다. 명령은 세션이 화면을 그릴 때의 데이터 버전(base)을
+# 가지고 오며, 그 뒤 다른 명령이 같은 행을 바꿨으면
+#   - insert: ID는 커밋 시 테이블 시퀀스에서 발급 (명시한 ID가 겹치면 재발급, unique 컬럼 중복·삭제된 학생 참조는 거부)
+#     insert_many 는 같은 규칙을 배치 전체에 한 번에 적용 (배치 안의 unique 중복도 거부)
+#   - update_many: expect 가 있으면 조건에 맞는 행에만 적용(나머지는 건너뜀), 없으면 update 와 같은 충돌 검사
+#   - update: expect(컬럼 → 허용 값 목록)가 현재 행에서도 성립하면 그대로 적용, 아니면 거부
+#   - delete / delete_student: 거부
+# 거부된 명령은 ConflictError 로 호출 측에 전달된다.
+class ConflictError(Exception):
+    pass
+
+_seq = 0                    # 커밋된 배치 수 = 세션이 보는 데이터 버전
+_touched = OrderedDict()    # (테이블, ID) -> 마지막으로 바꾼 버전
+_touched_floor = 0          # 이보다 오래된 변경 기록은 잘려 나가 알 수 없음
+TOUCHED_KEEP = 20000
+_writers = {}
+commit_hooks = []   # fn(커밋 전 tables, 적용된 ops, 커밋 후 tables) — 파생 집계 증분 갱신용
+
+def load_versioned():
+    # (데이터 버전, tables) — 쓰기 명령의 base 로 넘길 버전
+    with _lock:
+        tables = load_all()
+        return _seq, tables
+
+def _changed_since(key, base):
+    if base is None:
+        return False
+    return base < _touched_floor or _touched.get(key, 0) > base
+
+def _mark(op, version):
+    global _touched_floor
+    if op["op"] == "delete_student":
+        keys = [("Students", op["id"])]
+    elif op["op"] == "insert_many":
+        keys = [(op["table"], row["ID"]) for row in op["rows"]]
+    elif op["op"] == "update_many":
+        keys = [(op["table"], i) for i in op["ids"]]
+    else:
+        keys = [(op["table"], op["row"]["ID"] if op["op"] == "insert" else op["id"])]
+    for key in keys:
+        _touched[key] = version
+        _touched.move_to_end(key)
+    while len(_touched) > TOUCHED_KEEP:
+        _, old = _touched.popitem(last=False)
+        _touched_floor = max(_touched_floor, old)
+
+class _Ids:
+    # 쓰기 배치 하나의 ID 발급. 테이블마다 배치에서 ID 를 지정하지 않은 insert 행 수만큼을 처음 필요할 때 한 번에
+    # 예약하고 (SQLite 에서는 예약마다 연결 + BEGIN IMMEDIATE), 명시한 ID 의 하한도 모아 두었다가 커밋 전에 한 번 반영.
+    # 거부된 명령의 몫은 빈 번호로 남는다
+    def __init__(self, batch):
+        self.left = Counter()   # 테이블 -> 아직 ID 를 받지 않은, ID 미지정 insert 행 수
+        for cmd_ops, *_ in batch:
+            for op in cmd_ops:
+                if op.get("op") in ("insert", "insert_many"):
+                    rows = [op["row"]] if op["op"] == "insert" else op["rows"]
+                    self.left[op["table"]] += sum(r.get("ID") in (None, "") for r in rows)
+        self.free = {}    # 테이블 -> (다음 ID, 예약 끝)
+        self.floor = {}   # 테이블 -> 명시한 ID 중 최대
+
+    def take(self, name, n=1):
+        nxt, end = self.free.get(name, (0, 0))
+        if end - nxt < n:
+            k = max(n, self.left[name])
+            nxt = backend().reserve(name, k)
+            end = nxt + k
+        self.free[name] = (nxt + n, end)
+        self.left[name] -= n
+        return nxt
+
+    def keep(self, name, rid):
+        self.floor[name] = max(self.floor.get(name, 0), int(rid))
+
+    def flush(self):
+        # 명시한 ID 이하를 다시 내주지 않도록 (이미 예약한 범위 안이면 호출하지 않음)
+        for name, rid in self.floor.items():
+            if rid >= self.free.get(name, (0, 0))[1]:
+                backend().reserve(name, 0, floor=rid)
+
+_MISSING = object()
+
+class _Overlay:
+    # 쓰기 배치의 시작 tables 위에, 배치 안에서 먼저 받아들인 명령이 바꾼 행만 따로 들고 있는 층.
+    # 명령마다 전체 프레임에 apply_ops(concat + typed) 하지 않고 이것으로 검사하며, 받아들인 ops 는
+    # 배치 끝에 백엔드가 한 번에 적용한다. 거부된 명령이 남긴 변경은 rollback 으로 되돌림
+    def __init__(self, tables):
+        self.t = dict(zip(TABLES, tables))
+        self.rows = {n: {} for n in TABLES}   # 테이블 -> {ID: 배치에서 insert 한 행 / update 한 값 (연산 값 그대로)}
+        self.new = {n: {} for n in TABLES}    # 테이블 -> {배치에서 insert 한 ID: True}
+        self.gone = {n: {} for n in TABLES}   # 테이블 -> {배치에서 지운 ID: True}
+        self.cascaded = {}                    # 관련 기록까지 지운 학생 ID -> True
+        self._strs = {}                       # (테이블, 컬럼) -> 시작 tables 의 문자열 값 (unique 검사용)
+        self._undo = []
+
+    def _put(self, d, key, value):
+        self._undo.append((d, key, d.get(key, _MISSING)))
+        if value is _MISSING:
+            d.pop(key, None)
+        else:
+            d[key] = value
+
+    def mark(self):
+        return len(self._undo)
+
+    def rollback(self, mark):
+        while len(self._undo) > mark:
+            d, key, old = self._undo.pop()
+            if old is _MISSING:
+                d.pop(key, None)
+            else:
+                d[key] = old
+
+    def live_ids(self, name, ids):
+        # ids(Series) 중 지금 있는 행의 ID 인지 (bool Series)
+        gone, new = list(self.gone[name]), list(self.new[name])
+        return (ids.isin(self.t[name]["ID"]) & ~ids.isin(gone)) | ids.isin(new)
+
+    def rows_of(self, name, ids):
+        # 지금 있는 행 → {ID: {컬럼: 값}} (시작 tables 의 행에 배치의 변경을 덮어씀)
+        ids = [i for i in ids if i not in self.gone[name]]
+        df = self.t[name]
+        out = {r["ID"]: r for r in df[df["ID"].isin([i for i in ids if i not in self.new[name]])].to_dict("records")}
+        for i in ids:
+            over = self.rows[name].get(i)
+            if over is not None:
+                vals = {k: scalar(name, k, v) for k, v in over.items() if k in TABLES[name]}
+                out[i] = {**dict.fromkeys(TABLES[name]), **vals} if i in self.new[name] else {**out[i], **vals} if i in out else None
+        return {i: r for i, r in out.items()
+                if r is not None and (name == "Students" or r.get("StudentID") not in self.cascaded)}
+
+    def taken(self, name, col, values):
+        # values(문자열 집합) 중 지금 있는 행이 이미 쓰고 있는 값
+        if (name, col) not in self._strs:
+            df = self.t[name]
+            self._strs[(name, col)] = pd.Series(df[col].astype(str).to_numpy(), index=df["ID"].to_numpy())
+        strs = self._strs[(name, col)]
+        hit = strs[strs.isin(values)]
+        out = {v for i, v in hit.items() if i not in self.gone[name] and col not in self.rows[name].get(i, ())}
+        for i, over in self.rows[name].items():
+            if col in over and i not in self.gone[name] and str(scalar(name, col, over[col])) in values:
+                out.add(str(scalar(name, col, over[col])))
+        return out
+
+    def note(self, op):
+        # 받아들인 연산을 층에 반영
+        kind = op["op"]
+        if kind in ("insert", "insert_many"):
+            name = op["table"]
+            for row in [op["row"]] if kind == "insert" else op["rows"]:
+                self._put(self.rows[name], row["ID"], row)
+                self._put(self.new[name], row["ID"], True)
+                self._put(self.gone[name], row["ID"], _MISSING)
+        elif kind in ("update", "update_many"):
+            name = op["table"]
+            for i in [op["id"]] if kind == "update" else op["ids"]:
+                self._put(self.rows[name], i, {**self.rows[name].get(i, {}), **op["values"]})
+        else:
+            name = "Students" if kind == "delete_student" else op["table"]
+            for d, v in ((self.rows[name], _MISSING), (self.new[name], _MISSING), (self.gone[name], True)):
+                self._put(d, op["id"], v)
+            if kind == "delete_student" and op.get("cascade"):
+                self._put(self.cascaded, op["id"], True)
+
+def _resolve(view, ops, base, ids):
+    # 명령 하나를 현재 상태(view: 배치 시작 tables + 배치 안의 앞선 변경)에 맞춰 검사/재배치 → 실제 적용할 ops
+    out = []
+    for op in ops:
+        check_op(op)
+        kind = op["op"]
+        if kind == "insert":
+            name, row = op["table"], dict(op["row"])
+            if name != "Students" and not view.rows_of("Students", [row["StudentID"]]):
+                raise ConflictError("학생 정보가 삭제되어 저장할 수 없습니다.")
+            for col in op.get("unique", ()):
+                if view.taken(name, col, {str(row[col])}):
+                    raise ConflictError(f"이미 존재하는 값입니다: {col}={row[col]}")
+            if row.get("ID") in (None, "") or view.live_ids(name, pd.Series([row["ID"]])).iloc[0]:
+                row["ID"] = ids.take(name)       # ID 미지정, 또는 명시한 ID가 이미 있으면 새로 발급
+            else:
+                ids.keep(name, row["ID"])
+            op = {"op": "insert", "table": name, "row": row}
+        elif kind == "insert_many":
+            op = _resolve_many(view, op, ids)
+        elif kind == "update_many":
+            op = _resolve_update_many(view, op, base)
+        elif kind in ("update", "delete"):
+            name = op["table"]
+            cur = view.rows_of(name, [op["id"]]).get(op["id"])
+            if cur is None:
+                raise ConflictError("이미 삭제된 항목입니다.")
+            if _changed_since((name, op["id"]), base) and not (kind == "update" and op.get("expect")):
+                raise ConflictError("다른 사용자가 먼저 수정했습니다. 새로고침 후 다시 시도하세요.")
+            for col, allowed in op.get("expect", {}).items():
+                if cur[col] not in allowed:
+                    raise ConflictError(f"현재 {col} 값({cur[col]})에서는 처리할 수 없습니다.")
+            op = {k: op[k] for k in ("op", "table", "id", "values") if k in op}
+        elif _changed_since(("Students", op["id"]), base):
+            raise ConflictError("다른 사용자가 먼저 수정했습니다. 새로고침 후 다시 시도하세요.")
+        view.note(op)
+        out.append(op)
+    return out
+
+def _resolve_many(view, op, ids):
+    # insert_many 검사를 배치 전체에 대해 한 번에 (행마다 테이블을 훑지 않음)
+    name, rows = op["table"], [dict(r) for r in op["rows"]]
+    if name != "Students":
+        sids = pd.Series([r.get("StudentID") for r in rows])
+        missing = sids[~view.live_ids("Students", sids)]
+        if len(missing):
+            raise ConflictError(f"삭제되었거나 없는 학생을 참조합니다: StudentID={sorted(set(missing.tolist()))[:10]}")
+    for col in op.get("unique", ()):
+        vals = pd.Series([str(r.get(col, "")) for r in rows])
+        bad = vals[vals.duplicated() | vals.isin(view.taken(name, col, set(vals)))]
+        if len(bad):
+            raise ConflictError(f"이미 존재하거나 중복된 값입니다: {col}={sorted(set(bad.tolist()))[:10]}")
+    given_ids = pd.Series([r.get("ID") for r in rows], dtype=object)
+    given = given_ids.notna() & (given_ids != "")
+    fresh = ~given | view.live_ids(name, given_ids) | given_ids.duplicated()   # 미지정·기존 ID와 겹침·배치 내 중복은 새로 발급
+    if fresh.any():
+        first = ids.take(name, int(fresh.sum()))
+        for i, rid in zip(fresh[fresh].index, range(first, first + int(fresh.sum()))):
+            rows[i]["ID"] = rid
+    if (~fresh).any():
+        ids.keep(name, pd.to_numeric(given_ids[~fresh]).max())
+    return {"op": "insert_many", "table": name, "rows": rows}
+
+def _resolve_update_many(view, op, base):
+    # 일괄 상태 변경: 이미 삭제됐거나 expect 에 맞지 않는 행은 빼고 나머지만 적용 (적용된 ids 를 돌려줌)
+    name, expect = op["table"], op.get("expect") or {}
+    cur = view.rows_of(name, op["ids"])
+    ids = [i for i in op["ids"] if i in cur and all(cur[i][col] in allowed for col, allowed in expect.items())]
+    if not expect and any(_changed_since((name, i), base) for i in ids):
+        raise ConflictError("다른 사용자가 먼저 수정했습니다. 새로고침 후 다시 시도하세요.")
+    return {"op": "update_many", "table": name, "ids": ids, "values": op["values"]}
+
+class _Writer:
+    def __init__(self, name):
+        self.q = queue.Queue()
+        self.thread = threading.Thread(target=self._run, name=f"writer:{name}", daemon=True)
+        self.thread.start()
+
+    def submit(self, ops, base=None):
+        fut = Future()
+        self.q.put((ops, base, fut))
+        return fut
+
+    def _run(self):
+        while True:
+            batch = [self.q.get()]
+            deadline = time.monotonic() + WRITE_BATCH_WINDOW
+            while len(batch) < WRITE_BATCH_MAX:
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    break
+                try:
+                    batch.append(self.q.get(timeout=left))
+                except queue.Empty:
+                    break
+            try:
+                self._commit(batch)
+            except Exception as e:  # 저장 실패는 배치 전체에 전달
+                log.exception("쓰기 배치 실패")
+                for *_, fut in batch:
+                    if not fut.done():
+                        fut.set_exception(e)
+
+    def _commit(self, batch):
+        global _seq
+        with _lock:
+            before = load_all()
+            accepted, ops, ids, view = [], [], _Ids(batch), _Overlay(before)
+            for cmd_ops, base, fut in batch:
+                mark = view.mark()
+                try:
+                    out = _resolve(view, cmd_ops, base, ids)
+                except (ConflictError, KeyError, ValueError) as e:
+                    view.rollback(mark)
+                    fut.set_exception(e)
+                    continue
+                accepted.append((out, fut))
+                ops += out
+            if not ops:
+                return
+            ids.flush()
+            with span("commit", ops=len(ops)):
+                backend().apply(ops)
+            invalidate()
+            _seq += 1
+            for op in ops:
+                _mark(op, _seq)
+            if commit_hooks:
+                after = load_all()
+                for hook in commit_hooks:
+                    try:
+                        hook(before, ops, after)
+                    except Exception:
+                        log.exception("커밋 후처리 실패: %s", hook)
+        for out, fut in accepted:
+            fut.set_result(out)
+
+def _writer():
+    b = backend()
+    key = str(Path(b.path).resolve())
+    with _lock:
+        if key not in _writers:
+            _writers[key] = _Writer(b.path.name)
+        return _writers[key]
+
+def reserve_ids(table, n=1):
+    # 테이블 시퀀스에서 ID n개를 한 번에 예약 (일괄 입력용). 삭제된 ID는 다시 쓰지 않는다
+    with _lock:
+        first = backend().reserve(table, n)
+    return range(first, first + n)
+
+def next_id(table):
+    return reserve_ids(table)[0]
+
+def apply(ops, base=None):
+    # 쓰기 큐에 넣고 커밋될 때까지 대기 → 실제 적용된 ops (재배치된 ID 포함)
+    with span("apply", ops=len(ops)):
+        return _writer().submit(ops, base).result(timeout=WRITE_TIMEOUT)
+
+def insert_row(table, row, base=None, unique=()):
+    out = apply([{"op": "insert", "table": table, "row": row, "unique": list(unique)}], base)
+    return out[0]["row"]["ID"]
+
+def bulk_insert(table, rows, base=None, unique=()):
+    # 여러 행을 한 명령(한 번의 커밋)으로 추가 → 발급된 ID 목록. 한 행이라도 거부되면 전체 거부
+    rows = list(rows)
+    if not rows:
+        return []
+    out = apply([{"op": "insert_many", "table": table, "rows": rows, "unique": list(unique)}], base)
+    return [row["ID"] for row in out[0]["rows"]]
+
+def update_row(table, row_id, values, base=None, expect=None):
+    op = {"op": "update", "table": table, "id": row_id, "values": values}
+    if expect:
+        op["expect"] = expect
+    apply([op], base)
+
+def delete_row(table, row_id, base=None):
+    apply([{"op": "delete", "table": table, "id": row_id}], base)
+
+def delete_student(sid, cascade=False, base=None):
+    apply([{"op": "delete_student", "id": sid, "cascade": cascade}], base)
@@ -0,0 +1,40 @@
+import pandas as pd
+import pytest
+
+import archive
+import storage
+from storage import TABLES, ExcelBackend, SqliteBackend, typed
+
+# 학년도 마감으로 가장 큰 ID 가 보관 파일로 빠진 뒤에도 새 행이 그 ID 를 받지 않는지
+
+def _tables():
+    students = pd.DataFrame({"ID": [1, 2], "Name": ["재학생", "퇴사생"], "StudentNo": ["01", "02"],
+                             "Password": ["p", "p"], "OutDate": ["", "2024-01-10"]})
+    outings = pd.DataFrame({"ID": [1, 2], "StudentID": [2, 1], "Type": ["외박", "외출"], "Reason": ["귀가", "병원"],
+                            "StartDate": ["2023-05-01", "2023-06-01"], "EndDate": ["2023-05-02", "2023-06-01"],
+                            "Status": ["승인", "승인"]})
+    frames = {"Students": students, "Outings": outings}
+    return tuple(typed(n, frames.get(n, pd.DataFrame()).reindex(columns=cols)) for n, cols in TABLES.items())
+
+@pytest.mark.parametrize("kind", ["sqlite", "excel"])
+def test_closed_year_ids_not_reused(tmp_path, use, kind, caplog):
+    xlsx = tmp_path / "data.xlsx"
+    ExcelBackend(xlsx).write(_tables())
+    xlsx.with_name(xlsx.name + ".seq").unlink()   # 시퀀스 파일이 없는 예전 data.xlsx
+    use(SqliteBackend(tmp_path / "data.db", migrate_from=xlsx) if kind == "sqlite" else ExcelBackend(xlsx))
+    moved = archive.close_year(2023, today="2026-10-18")
+    assert moved["Students"] == 1 and moved["Outings"] == 2
+    sid = storage.insert_row("Students", {"Name": "새학생", "StudentNo": "03", "Password": "p"})
+    oid = storage.insert_row("Outings", {"StudentID": sid, "Type": "외출", "Reason": "", "StartDate": "2026-10-18",
+                                         "EndDate": "2026-10-18", "Status": "신청"})
+    assert (sid, oid) == (3, 3)
+    students, outings, *_ = archive.with_archive(storage.load_all(), "2023-03-01", "2026-12-31")
+    assert students["ID"].tolist() == [1, 2, 3] and outings["ID"].tolist() == [1, 2, 3]
+    assert "겹칩니다" not in caplog.text
+
+def test_concat_warns_on_clashing_ids(caplog):
+    a, b = _tables()[1], _tables()[1].assign(Reason="다른 사유")
+    assert archive._concat("Outings", [a, a])["ID"].tolist() == [1, 2]
+    assert "겹칩니다" not in caplog.text
+    assert archive._concat("Outings", [a, b])["Reason"].tolist() == ["다른 사유"] * 2
+    assert "겹칩니다" in caplog.text
@@ -0,0 +1,71 @@
+import pytest
+
+from sheets import FakeAPIError, FakeSpreadsheet, SheetsBackend, _parse, _rows
+from storage import TABLES
+
+# 두 PC(SheetsBackend 두 개)가 가짜 시트 하나를 공유하는 상황에서 동기화/ID 재배치/재시도를 확인
+
+def _insert(b, table, row):
+    rid = b.reserve(table)
+    b.apply([{"op": "insert", "table": table, "row": dict(row, ID=rid)}])
+    return rid
+
+def _sheet(fake):
+    vals = fake.values_batch_get(list(TABLES))["valueRanges"]
+    return tuple(_parse(n, v.get("values", []))[0] for n, v in zip(TABLES, vals))
+
+def _same(*backends, fake):
+    # 모든 캐시와 시트 내용이 같은지
+    for name, *frames in zip(TABLES, *(b.read() for b in backends), _sheet(fake)):
+        rows = [_rows(df, TABLES[name]) for df in frames]
+        assert all(r == rows[0] for r in rows), name
+
+@pytest.fixture
+def pcs(tmp_path):
+    fake = FakeSpreadsheet()
+    a = SheetsBackend(fake, tmp_path / "a.db", autostart=False)
+    b = SheetsBackend(fake, tmp_path / "b.db", autostart=False)
+    for i in range(3):
+        _insert(a, "Students", {"Name": f"학생{i}", "StudentNo": f"0{i}", "Password": "p"})
+    a.sync()
+    b.sync()
+    return fake, a, b
+
+def test_sync_rebases_clashing_ids(pcs):
+    fake, a, b = pcs
+    _same(a, b, fake=fake)
+    sa = _insert(a, "Students", {"Name": "A", "StudentNo": "200", "Password": "p"})
+    _insert(a, "Scores", {"StudentID": sa, "Category": "상점", "Points": 3, "Date": "2026-10-01"})
+    sb = _insert(b, "Students", {"Name": "B", "StudentNo": "300", "Password": "p"})
+    assert sa == sb
+    b.sync()
+    a.sync()
+    b.sync()
+    _same(a, b, fake=fake)
+    students = a.read()[0].set_index("Name")["ID"]
+    assert students["B"] == sb and students["A"] != sa
+    assert a.read()[2]["StudentID"].tolist() == [students["A"]]   # 상벌점도 바뀐 학생 ID 를 따라감
+
+def test_remote_changes_apply_rows_without_rebuilding_cache(pcs, monkeypatch):
+    fake, a, b = pcs
+    monkeypatch.setattr(b.local, "write", lambda tables: pytest.fail("캐시 전체를 다시 썼음"))
+    a.apply([{"op": "update", "table": "Students", "id": 1, "values": {"Room": "101"}},
+             {"op": "delete_student", "id": 2, "cascade": True}])
+    a.sync()
+    b.sync()
+    _same(a, b, fake=fake)
+    assert b.read()[0].set_index("ID").loc[1, "Room"] == "101"
+    assert 2 not in b.read()[0]["ID"].tolist()
+
+def test_failed_push_stays_queued_and_retries(pcs):
+    fake, a, b = pcs
+    a.apply([{"op": "update_many", "table": "Students", "ids": [1, 3], "values": {"Room": "999"}}])
+    fake.fail_next = 1
+    with pytest.raises(FakeAPIError):
+        a.sync()
+    assert a.sync_status()["pending"] == 1
+    a.sync()
+    b.sync()
+    assert a.sync_status()["pending"] == 0
+    _same(a, b, fake=fake)
+    assert b.read()[0].set_index("ID")["Room"].to_dict() == {1: "999", 2: "", 3: "999"}
@@ -0,0 +1,70 @@
+import pandas as pd
+import pytest
+
+import storage
+from storage import TABLES, ExcelBackend, SqliteBackend, typed
+
+# 지운 행의 ID 를 다시 내주지 않는지 (이관/전체 교체 뒤에도)
+
+def _tables():
+    students = pd.DataFrame({"ID": [1, 2, 3], "Name": ["가", "나", "다"], "StudentNo": ["01", "02", "03"],
+                             "Password": ["p", "p", "p"]})
+    scores = pd.DataFrame({"ID": [1], "StudentID": [3], "Category": ["벌점"], "Points": [-1], "Date": ["2026-03-02"]})
+    frames = {"Students": students, "Scores": scores}
+    return tuple(typed(n, frames.get(n, pd.DataFrame()).reindex(columns=cols)) for n, cols in TABLES.items())
+
+def _legacy_xlsx(tmp_path):
+    # 시퀀스 파일이 없는 예전 data.xlsx
+    path = tmp_path / "data.xlsx"
+    ExcelBackend(path).write(_tables())
+    path.with_name(path.name + ".seq").unlink()
+    return path
+
+def _new_student():
+    return storage.insert_row("Students", {"Name": "새학생", "StudentNo": "09", "Password": "p"})
+
+@pytest.mark.parametrize("kind", ["sqlite", "excel"])
+def test_deleted_id_not_reused_after_migration(tmp_path, use, kind):
+    xlsx = _legacy_xlsx(tmp_path)
+    use(SqliteBackend(tmp_path / "data.db", migrate_from=xlsx) if kind == "sqlite" else ExcelBackend(xlsx))
+    storage.delete_student(3)
+    assert _new_student() == 4
+    scores = storage.load_all()[2]
+    assert scores["StudentID"].tolist() == [3]   # 남은 벌점이 새 학생에게 붙지 않음
+
+@pytest.mark.parametrize("kind", ["sqlite", "excel"])
+def test_deleted_id_not_reused_after_full_rewrite(tmp_path, use, kind):
+    use(SqliteBackend(tmp_path / "data.db") if kind == "sqlite" else ExcelBackend(tmp_path / "data.xlsx"))
+    storage.save_all(*_tables())
+    students, *rest = storage.load_all()
+    storage.save_all(students[students["ID"] != 3], *rest)
+    assert _new_student() == 4
+
+def test_batch_commands_see_earlier_commands(tmp_path, use):
+    # 한 배치 안의 명령도 앞서 받아들인 명령의 결과를 기준으로 검사되고, 거부된 명령은 흔적을 남기지 않음
+    from concurrent.futures import Future
+    use(SqliteBackend(tmp_path / "data.db"))
+    storage.save_all(*_tables())
+    outing = {"StudentID": 1, "Type": "외출", "Reason": "", "StartDate": "2026-10-18", "EndDate": "2026-10-18",
+              "Status": "신청"}
+    oid = storage.insert_row("Outings", outing)
+    cmds = [
+        [{"op": "insert", "table": "Students", "row": {"Name": "라", "StudentNo": "04", "Password": "p"}, "unique": ["StudentNo"]}],
+        [{"op": "insert", "table": "Students", "row": {"Name": "마", "StudentNo": "04", "Password": "p"}, "unique": ["StudentNo"]}],
+        [{"op": "update", "table": "Outings", "id": oid, "values": {"Status": "승인"}, "expect": {"Status": ["신청"]}}],
+        [{"op": "update", "table": "Outings", "id": oid, "values": {"Status": "반려"}, "expect": {"Status": ["신청"]}}],
+        [{"op": "delete_student", "id": 2, "cascade": True},
+         {"op": "insert", "table": "Scores", "row": {"StudentID": 2, "Category": "상점", "Points": 1, "Date": "2026-10-18"}}],
+        [{"op": "insert", "table": "Scores", "row": {"StudentID": 2, "Category": "상점", "Points": 1, "Date": "2026-10-18"}}],
+        [{"op": "delete_student", "id": 3, "cascade": True}],
+        [{"op": "insert_many", "table": "Scores", "rows": [{"StudentID": 3, "Category": "상점", "Points": 1,
+                                                            "Date": "2026-10-18"}]}],
+    ]
+    batch = [(ops, None, Future()) for ops in cmds]
+    storage._Writer._commit(None, batch)
+    failed = [i for i, (*_, fut) in enumerate(batch) if fut.exception()]
+    assert failed == [1, 3, 4, 7]
+    students, outings, scores, _ = storage.load_all()
+    assert sorted(students["ID"].tolist()) == [1, 2, 4]    # 거부된 명령의 delete_student(2) 는 적용되지 않음
+    assert outings.set_index("ID").loc[oid, "Status"] == "승인"
+    assert len(scores) == 1 and scores["StudentID"].tolist() == [2]
@@ -0,0 +1,109 @@
+import datetime
+import heapq
+import json
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+
+log = logging.getLogger(__name__)
+
+# ================== 설정 ==================
+TIMING_ENABLED = True
+TIMING_LOG = Path("timing.jsonl")      # rerun 마다 한 줄 (JSON lines). None 이면 파일 기록 안 함
+TIMING_LOG_BYTES = 5 * 1024 * 1024     # 이 크기를 넘으면 timing.jsonl.1, .2 ... 로 넘김
+TIMING_LOG_BACKUPS = 3
+RECENT_PER_SPAN = 500    # 구간 이름마다 최근 이만큼의 소요 시간으로 p50/p95 계산
+RECENT_SPANS = 2000      # 가장 느린 연산 목록은 최근 이만큼의 구간 중에서
+
+# ================== 구간 측정 ==================
+# span(이름, **필드) 으로 감싼 구간의 시간을 잰다. 스트림릿은 세션마다 별도 스레드에서 스크립트를 돌리므로
+# 진행 중인 rerun 기록은 스레드별로 두고, rerun 밖(쓰기 스레드 등)의 구간은 구간별 통계에만 남긴다.
+# 구간마다 perf_counter 두 번과 deque 추가뿐이라 운영 중에도 켜 둔다.
+_local = threading.local()
+_lock = threading.Lock()
+_recent = defaultdict(lambda: deque(maxlen=RECENT_PER_SPAN))   # 이름 -> 최근 소요 시간(ms)
+_spans = deque(maxlen=RECENT_SPANS)                            # (시각, 이름, ms, 필드)
+_jsonl = None
+
+def _record(name, ms, fields):
+    with _lock:
+        _recent[name].append(ms)
+        _spans.append((time.time(), name, ms, fields))
+    run = getattr(_local, "run", None)
+    if run is not None:
+        s = run["spans"].setdefault(name, {"n": 0, "ms": 0.0})
+        s["n"] += 1
+        s["ms"] += ms
+        if isinstance(fields.get("rows"), dict):
+            run["rows"].update(fields["rows"])
+
+@contextmanager
+def span(name, **fields):
+    # 구간 안에서 돌려받은 dict 에 rows 등을 채우면 함께 기록된다
+    if not TIMING_ENABLED:
+        yield fields
+        return
+    t = time.perf_counter()
+    try:
+        yield fields
+    finally:
+        _record(name, (time.perf_counter() - t) * 1000, fields)
+
+@contextmanager
+def rerun(session, role, screen):
+    # 스크립트 한 번 실행을 잰다. st.stop()/st.rerun() 예외로 빠져나가도 기록하고 JSON 한 줄을 남김
+    if not TIMING_ENABLED:
+        yield None
+        return
+    run = _local.run = {"session": session, "role": role, "screen": screen, "rows": {}, "spans": {}}
+    t = time.perf_counter()
+    try:
+        yield run
+    finally:
+        _local.run = None
+        ms = (time.perf_counter() - t) * 1000
+        _record(f"rerun:{screen}", ms, {})
+        _write({"ts": datetime.datetime.now().isoformat(timespec="milliseconds"), "session": run["session"],
+                "role": run["role"], "screen": screen, "ms": round(ms, 2), "rows": run["rows"],
+                "spans": {k: {"n": v["n"], "ms": round(v["ms"], 2)} for k, v in run["spans"].items()}})
+
+def _write(rec):
+    global _jsonl
+    if TIMING_LOG is None:
+        return
+    with _lock:
+        if _jsonl is None:
+            _jsonl = logging.getLogger("dalgubul.timing")
+            _jsonl.propagate = False
+            _jsonl.setLevel(logging.INFO)
+            try:
+                h = RotatingFileHandler(TIMING_LOG, maxBytes=TIMING_LOG_BYTES, backupCount=TIMING_LOG_BACKUPS,
+                                        encoding="utf-8")
+                h.setFormatter(logging.Formatter("%(message)s"))
+                _jsonl.addHandler(h)
+            except OSError:
+                log.warning("%s 에 기록할 수 없어 시간 기록 파일을 쓰지 않습니다", TIMING_LOG, exc_info=True)
+    _jsonl.info(json.dumps(rec, ensure_ascii=False))
+
+# ================== 요약 ==================
+def _pct(vals, p):
+    return vals[min(len(vals) - 1, round(p / 100 * (len(vals) - 1)))]
+
+def span_stats():
+    # 구간 이름별 최근 횟수/p50/p95/최대 (ms)
+    with _lock:
+        items = [(name, sorted(v)) for name, v in _recent.items() if v]
+    return [{"구간": name, "횟수": len(v), "p50(ms)": round(_pct(v, 50), 1), "p95(ms)": round(_pct(v, 95), 1),
+             "최대(ms)": round(v[-1], 1)} for name, v in sorted(items)]
+
+def slowest(n=10):
+    # 최근 구간 중 가장 느린 n개 (rerun 전체는 제외)
+    with _lock:
+        spans = [s for s in _spans if not s[1].startswith("rerun:")]
+    return [{"시각": time.strftime("%H:%M:%S", time.localtime(ts)), "구간": name, "ms": round(ms, 1),
+             "정보": json.dumps(fields, ensure_ascii=False) if fields else ""}
+            for ts, name, ms, fields in heapq.nlargest(n, spans, key=lambda s: s[2])]
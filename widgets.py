@@ -0,0 +1,66 @@
+import datetime
+import math
+
+import streamlit as st
+
+from indexes import filter_rows, order_rows, student_search, value_rows
+
+# ================== 목록 컴포넌트 ==================
+# 필터/정렬은 서버에서 행 번호 배열로 처리하고, 현재 페이지의 행만 화면용으로 변환해 브라우저에 보낸다.
+PAGE_SIZES = [20, 50, 100]
+PICKER_LIMIT = 50
+
+def paged_table(df, key, table, students, view, sort_cols, choice=None, dates=None, default_sort=None, desc=True):
+    # view: 페이지 행(DataFrame) -> 화면용 DataFrame
+    # sort_cols: {라벨: 컬럼}, choice: (컬럼, 라벨) 다중 선택 필터, dates: (시작 컬럼, 종료 컬럼 또는 None, 라벨)
+    c1,c2,c3,c4 = st.columns(4)
+    with c1:
+        text = st.text_input("검색 (이름/학번/호실)", key=f"{key}_q")
+    with c2:
+        picked = st.multiselect(choice[1], sorted(value_rows(df, table, choice[0]), key=str), key=f"{key}_choice") if choice else []
+    with c3:
+        rng = ()
+        if dates and st.checkbox(f"{dates[2]} 기간 지정", key=f"{key}_use_dates"):
+            today = datetime.date.today()
+            rng = st.date_input(f"{dates[2]} 기간", (today.replace(day=1), today), key=f"{key}_dates")
+    with c4:
+        labels = list(sort_cols)
+        label = st.selectbox("정렬", labels, index=labels.index(default_sort) if default_sort in labels else 0, key=f"{key}_sort")
+        desc = st.checkbox("내림차순", value=desc, key=f"{key}_desc")
+
+    start, end = (rng[0].isoformat(), rng[1].isoformat()) if len(rng)==2 else (None, None)
+    pos = filter_rows(df, table, students, text, choice[0] if choice else None, picked,
+                      dates[:2] if dates else None, start, end)
+    col = sort_cols[label]
+    rows = order_rows(df, table, pos, col, desc, date=bool(dates) and col in dates[:2])
+
+    total = len(rows)
+    p1,p2,p3 = st.columns([1,1,4])
+    with p1:
+        size = st.selectbox("페이지 크기", PAGE_SIZES, index=1, key=f"{key}_size")
+    pages = max(1, math.ceil(total / size))
+    with p2:
+        page = st.number_input("페이지", min_value=1, max_value=pages, value=1, step=1, key=f"{key}_page")
+    page = min(int(page), pages)
+    chunk = df.iloc[rows[(page-1)*size : page*size]]
+    st.dataframe(view(chunk), use_container_width=True)
+    with p3:
+        st.caption(f"총 {total}건 · {page}/{pages} 페이지")
+    return chunk
+
+def student_picker(students, key, label="수정/삭제할 학생 검색 (이름/학번/호실)"):
+    # 검색어로 후보를 좁힌 뒤 선택 → 선택한 학생의 학번 (전체 학생 목록을 selectbox 에 싣지 않음)
+    text = st.text_input(label, key=f"{key}_q")
+    ids = student_search(students, text) if text.strip() else students["ID"].to_numpy()
+    if len(ids) > PICKER_LIMIT:
+        st.caption(f"{len(ids)}명 중 {PICKER_LIMIT}명만 표시합니다. 검색어를 더 입력하세요.")
+        ids = ids[:PICKER_LIMIT]
+    if not len(ids):
+        st.info("검색 결과가 없습니다.")
+        return None
+    rows = students[students["ID"].isin(ids)]
+    options = [str(no) for no in rows["StudentNo"].tolist()]
+    labels = {str(no): f"{no} | {name} | {room}" for no, name, room in
+              zip(rows["StudentNo"].tolist(), rows["Name"].tolist(), rows["Room"].tolist())}
+    sel = st.selectbox("학생 선택 (학번 | 이름 | 호실)", options, format_func=labels.get, key=f"{key}_sel")
+    return sel